@@ -0,0 +1,69 @@
+"""
+Compares memory and build time of a list of lot objects versus the array-backed Auction with merged price levels
+on a synthetic dump of a single item.
+
+    $ python benchmarks/auction_model_memory.py [lots]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from model.auction import Auction  # noqa: E402
+
+
+class Lot:
+    # lot representation before price level aggregation
+
+    def __init__(self, price: int, qty: int):
+        self.price = price
+        self.qty = qty
+
+
+def generate_lots(lots: int, distinct_prices: int, seed: int = 0) -> list[tuple[int, int]]:
+    rnd = random.Random(seed)
+    base = 10_000
+    return [(base + int(rnd.paretovariate(1.5) * distinct_prices) % distinct_prices, rnd.randint(1, 200))
+            for _ in range(lots)]
+
+
+def build_objects(lots: list[tuple[int, int]]):
+    result = [Lot(price, qty) for price, qty in lots]
+    result.sort(key=lambda lot: lot.price)
+    return result
+
+
+def build_auction(lots: list[tuple[int, int]]):
+    auction = Auction(1)
+    for price, qty in lots:
+        auction.add(price, qty)
+    auction.finalize()
+    return auction
+
+
+def measure(name, func, lots):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(lots)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(f"{name:>8}: retained={current / 1024 / 1024:8.2f} MiB peak={peak / 1024 / 1024:8.2f} MiB "
+          f"time={elapsed:6.2f}s")
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    for distinct_prices in (5_000, 1_000_000):
+        lots = generate_lots(count, distinct_prices)
+        print(f"lots={count} distinct_prices<={distinct_prices}")
+        measure('objects', build_objects, lots)
+        measure('auction', build_auction, lots)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Compares peak memory of parsing a synthetic connected realm auction dump
+with json.loads versus the streaming parser.
+
+    $ python benchmarks/auctions_memory.py [lots]
+"""
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from model.auction import Auction  # noqa: E402
+from wow.auction_parser import parse_auctions, CHUNK_SIZE  # noqa: E402
+
+WATCHED_ITEMS = [171276, 171315, 172230, 168487, 152510]
+
+
+def generate_dump(lots: int, seed: int = 0) -> bytes:
+    rnd = random.Random(seed)
+    auctions = []
+    for i in range(lots):
+        item_id = rnd.choice(WATCHED_ITEMS) if rnd.random() < 0.01 else rnd.randint(1, 200000)
+        auction = {'id': i, 'item': {'id': item_id}, 'quantity': rnd.randint(1, 200), 'time_left': 'LONG'}
+        if rnd.random() < 0.5:
+            auction['unit_price'] = rnd.randint(100, 10_000_000)
+        else:
+            auction['buyout'] = rnd.randint(100, 10_000_000)
+        auctions.append(auction)
+    return json.dumps({
+        '_links': {'self': {'href': 'https://eu.api.blizzard.com/data/wow/connected-realm/1/auctions'}},
+        'connected_realm': {'href': 'https://eu.api.blizzard.com/data/wow/connected-realm/1'},
+        'auctions': auctions
+    }).encode('utf-8')
+
+
+def parse_full(content: bytes) -> dict[int, Auction]:
+    auctions_data = {}
+    for auction in json.loads(content)['auctions']:
+        item_id = auction['item']['id']
+        if item_id in WATCHED_ITEMS:
+            price = auction.get('unit_price') or auction.get('buyout')
+            item = auctions_data.setdefault(item_id, Auction(item_id))
+            item.add(price, auction['quantity'])
+    for auction in auctions_data.values():
+        auction.finalize()
+    return auctions_data
+
+
+def parse_streaming(content: bytes) -> dict[int, Auction]:
+    chunks = (content[i:i + CHUNK_SIZE] for i in range(0, len(content), CHUNK_SIZE))
+    return parse_auctions(chunks, WATCHED_ITEMS)
+
+
+def measure(name, func, content):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func(content)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    lots = sum(a.listings for a in result.values())
+    print(f"{name:>10}: peak={peak / 1024 / 1024:8.2f} MiB time={elapsed:6.2f}s lots={lots}")
+
+
+def main():
+    lots = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    content = generate_dump(lots)
+    print(f"dump: {lots} auctions, {len(content) / 1024 / 1024:.2f} MiB")
+    measure('json.loads', parse_full, content)
+    measure('streaming', parse_streaming, content)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Times the stages of the check pipeline on synthetic data: auction data parsing, the notification evaluators,
+database read paths and a full check of a connected realm. Prints a summary and optionally writes JSON results, which
+can be compared across commits.
+
+    $ python benchmarks/check_pipeline.py [--lots 10000,100000,1000000] [--notifications 100,1000,10000,100000]
+        [--runs 3] [--output results.json] [--baseline previous.json]
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Optional
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+os.environ.setdefault('DATABASE', os.path.join(tempfile.gettempdir(), 'check_pipeline_bench.db'))
+
+import synthetic  # noqa: E402
+from bot_context import BotContext  # noqa: E402
+from bot_jobs import check, schedule  # noqa: E402
+from db.database import Database  # noqa: E402
+from model.notification import Notification  # noqa: E402
+from model.order_book import OrderBook  # noqa: E402
+from wow.wow_game_api import WowGameApi  # noqa: E402
+
+DEFAULT_LOTS = [10_000, 100_000, 1_000_000]
+DEFAULT_NOTIFICATIONS = [100, 1_000, 10_000, 100_000]
+# notifications used when varying the number of lots and vice versa
+BASE_NOTIFICATIONS = 1_000
+BASE_LOTS = 100_000
+
+
+class StaticResponse:
+    def __init__(self, status_code: int, content: bytes, headers: Optional[dict] = None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.text = content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+    def iter_content(self, chunk_size: int):
+        for i in range(0, len(self.content), chunk_size):
+            yield self.content[i:i + chunk_size]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class StaticHttp:
+    """
+    Stands in for `HttpPool`, serving the same auction data for every request.
+    """
+
+    def __init__(self, dump: bytes):
+        self._dump = dump
+
+    def get(self, url: str, **kwargs) -> StaticResponse:
+        return StaticResponse(200, self._dump, {'Last-Modified': synthetic.LAST_MODIFIED})
+
+    def post(self, url: str, **kwargs) -> StaticResponse:
+        return StaticResponse(200, b'{"access_token": "benchmark"}')
+
+    def stats(self) -> dict:
+        return {}
+
+    def close(self):
+        pass
+
+
+class Suite:
+    def __init__(self, runs: int):
+        self.runs = runs
+        self.results = []
+
+    def measure(self, name: str, params: dict, func: Callable, setup: Optional[Callable] = None):
+        times = []
+        for _ in range(self.runs):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+        result = {'name': name, **params, 'best': min(times), 'mean': sum(times) / len(times), 'runs': times}
+        self.results.append(result)
+        params_str = ' '.join(f"{k}={v}" for k, v in params.items())
+        print(f"{name:>24} {params_str:<32} best={result['best']:.4f}s mean={result['mean']:.4f}s", file=sys.stderr)
+
+
+def new_api(dump: bytes) -> WowGameApi:
+    return WowGameApi('benchmark', 'benchmark', StaticHttp(dump))
+
+
+def new_database(directory: str, notifications: int) -> Database:
+    db = Database(os.path.join(directory, f"{notifications}.db"))
+    synthetic.populate(db, notifications)
+    return db
+
+
+def bench_parse(suite: Suite, dumps: dict[int, bytes], item_ids: list[int]):
+    for lots, dump in dumps.items():
+        api = new_api(dump)
+        suite.measure('parse', {'lots': lots}, lambda: api.auctions(synthetic.REGION, synthetic.REALM_ID, item_ids))
+
+
+def bench_evaluators(suite: Suite, dump: bytes, lots: int, databases: dict[int, Database]):
+    evaluators = {
+        Notification.Kind.MAX_PRICE: check._check_min_qty,
+        Notification.Kind.MARKET_PRICE: check._check_market_price,
+        Notification.Kind.AVG_PRICE: check._check_average,
+    }
+    for notifications, db in databases.items():
+        targets = [t for _, realm_targets in db.get_notification_targets() for t in realm_targets]
+        item_ids = list({t.notification.item_id for t in targets})
+        auctions = new_api(dump).auctions(synthetic.REGION, synthetic.REALM_ID, item_ids)
+        books = {item_id: OrderBook(auction) for item_id, auction in auctions.items()}
+        for kind, evaluator in evaluators.items():
+            kind_targets = [t for t in targets if t.notification.kind == kind and t.notification.item_id in books]
+
+            def evaluate():
+                for target in kind_targets:
+                    evaluator(target.notification, books[target.notification.item_id], target.item_name, 'Realm')
+
+            suite.measure(evaluator.__name__, {'lots': lots, 'notifications': notifications}, evaluate)
+
+
+def bench_database(suite: Suite, databases: dict[int, Database]):
+    for notifications, db in databases.items():
+        params = {'notifications': notifications}
+        suite.measure('get_notification_targets', params, lambda: list(db.get_notification_targets()))
+        notification_ids = [n.n_id for n in db.get_notifications()]
+        suite.measure('get_alert_states', params, lambda: db.get_alert_states(notification_ids))
+        suite.measure('get_realm_schedules', params, lambda: db.get_realm_schedules())
+
+
+def bench_check(suite: Suite, dump: bytes, lots: int, db: Database, notifications: int):
+    context = BotContext.get()
+    context.database = db
+    context.wow_game_api = new_api(dump)
+    targets = [t for _, realm_targets in db.get_notification_targets() for t in realm_targets]
+    notification_ids = [t.notification.n_id for t in targets]
+
+    def setup():
+        # every run sends all triggered alerts
+        db.delete_alert_states(notification_ids)
+
+    suite.measure(
+        'check_and_notify',
+        {'lots': lots, 'notifications': notifications},
+        lambda: check._check_and_notify_unsafe(
+            schedule.new_schedule(synthetic.REALM_ID, schedule.MIN_INTERVAL), targets, force=True),
+        setup
+    )
+
+
+def compare(baseline: list[dict], results: list[dict]):
+    """
+    Prints change of the best time of each result found in the baseline.
+    """
+    def key(result: dict) -> tuple:
+        return tuple(sorted((k, v) for k, v in result.items() if k not in ('best', 'mean', 'runs')))
+
+    baseline_best = {key(r): r['best'] for r in baseline}
+    for result in results:
+        best = baseline_best.get(key(result))
+        if best:
+            params_str = ' '.join(f"{k}={v}" for k, v in result.items() if k not in ('name', 'best', 'mean', 'runs'))
+            change = (result['best'] - best) / best * 100
+            print(f"{result['name']:>24} {params_str:<32} {best:.4f}s -> {result['best']:.4f}s ({change:+.1f}%)",
+                  file=sys.stderr)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__), stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(',') if v]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check pipeline benchmarks')
+    parser.add_argument('--lots', type=parse_list, default=DEFAULT_LOTS)
+    parser.add_argument('--notifications', type=parse_list, default=DEFAULT_NOTIFICATIONS)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--output', help='path of JSON results')
+    parser.add_argument('--baseline', help='path of JSON results to compare with')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    suite = Suite(args.runs)
+    dumps = {lots: synthetic.generate_dump(lots) for lots in sorted(set(args.lots + [BASE_LOTS]))}
+    with tempfile.TemporaryDirectory() as tmp:
+        databases = {n: new_database(tmp, n) for n in sorted(set(args.notifications + [BASE_NOTIFICATIONS]))}
+        item_ids = list({n.item_id for n in databases[BASE_NOTIFICATIONS].get_notifications()})
+
+        bench_parse(suite, {lots: dumps[lots] for lots in args.lots}, item_ids)
+        bench_evaluators(suite, dumps[BASE_LOTS], BASE_LOTS, {n: databases[n] for n in args.notifications})
+        bench_database(suite, {n: databases[n] for n in args.notifications})
+        for lots in args.lots:
+            bench_check(suite, dumps[lots], lots, databases[BASE_NOTIFICATIONS], BASE_NOTIFICATIONS)
+        for notifications in args.notifications:
+            if notifications != BASE_NOTIFICATIONS:
+                bench_check(suite, dumps[BASE_LOTS], BASE_LOTS, databases[notifications], notifications)
+
+        for db in databases.values():
+            db.close()
+
+    report = {
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'runs': args.runs,
+        'results': suite.results
+    }
+    if args.baseline:
+        with open(args.baseline) as file:
+            compare(json.load(file)['results'], suite.results)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Measures the database work of a check cycle: per-notification lookups of realms, item names and users versus the
+single joined query.
+
+    $ python benchmarks/database_check_cycle.py [notifications]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from db.database import Database  # noqa: E402
+
+USERS = 1000
+REALMS = 50
+ITEMS = 500
+
+
+def populate(db: Database, notifications: int, seed: int = 0):
+    rnd = random.Random(seed)
+    db.migrate()
+    for realm_id in range(1, REALMS + 1):
+        db.add_connected_realm(realm_id, 'eu', f"realm-{realm_id}", f"Realm {realm_id}")
+    for item_id in range(1, ITEMS + 1):
+        db.add_item(item_id, f"Item {item_id}")
+    for telegram_id in range(1, USERS + 1):
+        db.add_user(telegram_id)
+    for _ in range(notifications):
+        db.add_notification(
+            rnd.randint(1, USERS), rnd.randint(1, REALMS), rnd.randint(1, ITEMS), 'max_price', 10000, 1)
+
+
+def check_cycle(db: Database):
+    by_realms = {}
+    for notification in db.get_notifications():
+        by_realms.setdefault(notification.connected_realm_id, []).append(notification)
+    for realm_id, notifications in by_realms.items():
+        db.get_connected_realm_by_id(realm_id)
+        db.get_items([n.item_id for n in notifications])
+        for notification in notifications:
+            db.get_user_by_id(notification.user_id)
+
+
+def check_cycle_bulk(db: Database):
+    for _ in db.get_notification_targets():
+        pass
+
+
+def measure(name, func, db: Database):
+    runs = []
+    for _ in range(5):
+        start = time.perf_counter()
+        func(db)
+        runs.append(time.perf_counter() - start)
+    print(f"{name:>8}: best={min(runs):.3f}s mean={sum(runs) / len(runs):.3f}s")
+
+
+def main():
+    notifications = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db = Database(os.path.join(tmp, 'bench.db'))
+        populate(db, notifications)
+        print(f"notifications={notifications}")
+        measure('lookups', check_cycle, db)
+        measure('bulk', check_cycle_bulk, db)
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+"""
+Local stand-ins for the Battle.net API and the Telegram Bot API, used for load testing.
+
+    $ python benchmarks/fake_servers.py [--blizzard-port 8081] [--telegram-port 8082] [--latency 0.05]
+        [--unauthorized-rate 0.01] [--too-many-requests-rate 0.01] [--rotation 60]
+
+Run the bot against them with `BNET_API_URL=http://127.0.0.1:8081/%s`, `BNET_TOKEN_URL=http://127.0.0.1:8081/token`
+and `TELEGRAM_API_URL=http://127.0.0.1:8082/bot`.
+"""
+import argparse
+import email.utils
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Optional
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import synthetic  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+_REALM_AUCTIONS = re.compile(r'^/(\w+)/data/wow/connected-realm/(\d+)/auctions$')
+_COMMODITIES = re.compile(r'^/(\w+)/data/wow/auctions/commodities$')
+_REALM_SEARCH = re.compile(r'^/(\w+)/data/wow/search/connected-realm$')
+_ITEM = re.compile(r'^/(\w+)/data/wow/item/(\d+)$')
+_ITEM_SEARCH = re.compile(r'^/(\w+)/data/wow/search/item$')
+_REALM_SLUG = re.compile(r'^realm-(\d+)$')
+
+
+class FakeBlizzard:
+    """
+    Battle.net API stand-in: OAuth token, connected realm search, item, item search and auction endpoints. Auction
+    data of each connected realm and region is rotated every `rotation` seconds, drawn from `variants` pregenerated
+    dumps, and honors `If-Modified-Since`. Requests are delayed by `latency` seconds (plus up to 50% jitter), 401 and
+    429 responses are injected with the given rates.
+    """
+
+    def __init__(
+            self,
+            lots: int = 10_000,
+            variants: int = 8,
+            rotation: int = 60,
+            latency: float = 0.0,
+            unauthorized_rate: float = 0.0,
+            too_many_requests_rate: float = 0.0,
+            seed: int = 0
+    ):
+        self.rotation = rotation
+        self.latency = latency
+        self.unauthorized_rate = unauthorized_rate
+        self.too_many_requests_rate = too_many_requests_rate
+        self.dumps = [synthetic.generate_dump(lots, seed + i) for i in range(variants)]
+        self.counters: dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._tokens: set[str] = set()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def roll(self, rate: float) -> bool:
+        with self._lock:
+            return self._random.random() < rate
+
+    def jitter(self, value: float) -> float:
+        with self._lock:
+            return value * self._random.uniform(1, 1.5)
+
+    def new_token(self) -> str:
+        token = uuid.uuid4().hex
+        with self._lock:
+            self._tokens.add(token)
+        return token
+
+    def revoke_token(self, token: str):
+        with self._lock:
+            self._tokens.discard(token)
+
+    def is_valid_token(self, token: str) -> bool:
+        with self._lock:
+            return token in self._tokens
+
+    def snapshot(self, key: int) -> tuple[bytes, int]:
+        """
+        Returns current auction data of the key and its last modified timestamp.
+        """
+        version = int(time.time()) // self.rotation
+        return self.dumps[(key + version) % len(self.dumps)], version * self.rotation
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        return _serve(port, self, _BlizzardHandler)
+
+
+class FakeTelegram:
+    """
+    Telegram Bot API stand-in, which records sent messages. `sendMessage` responds with 429 with the given rate.
+    """
+
+    def __init__(self, too_many_requests_rate: float = 0.0, seed: int = 0):
+        self.too_many_requests_rate = too_many_requests_rate
+        self.messages: list[tuple[float, int, str]] = []  # receive time, chat id, text
+        self.counters: dict[str, int] = {}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def count(self, name: str):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def roll(self, rate: float) -> bool:
+        with self._lock:
+            return self._random.random() < rate
+
+    def record(self, chat_id: int, text: str) -> int:
+        with self._lock:
+            self.messages.append((time.time(), chat_id, text))
+            return len(self.messages)
+
+    def serve(self, port: int) -> ThreadingHTTPServer:
+        return _serve(port, self, _TelegramHandler)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    fake = None
+
+    def send_json(self, status: int, body, headers: Optional[dict] = None):
+        self.send_body(status, json.dumps(body).encode('utf-8'), headers)
+
+    def send_body(self, status: int, body: bytes, headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+
+class _BlizzardHandler(_Handler):
+    fake: FakeBlizzard
+
+    def do_POST(self):
+        self.read_body()
+        if urlsplit(self.path).path != '/token':
+            self.send_json(404, {'detail': 'Not Found'})
+            return
+        self.fake.count('token')
+        self.send_json(200, {'access_token': self.fake.new_token(), 'token_type': 'bearer', 'expires_in': 86399})
+
+    def do_GET(self):
+        fake = self.fake
+        if fake.latency:
+            time.sleep(fake.jitter(fake.latency))
+        url = urlsplit(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        token = self.headers.get('Authorization', '').removeprefix('Bearer ')
+        if not fake.is_valid_token(token):
+            fake.count('unauthorized')
+            self.send_json(401, {'code': 401, 'type': 'BLZWEBAPI00000401', 'detail': 'Unauthorized'})
+            return
+        if fake.roll(fake.unauthorized_rate):
+            # expired token
+            fake.revoke_token(token)
+            fake.count('unauthorized')
+            self.send_json(401, {'code': 401, 'type': 'BLZWEBAPI00000401', 'detail': 'Unauthorized'})
+            return
+        if fake.roll(fake.too_many_requests_rate):
+            fake.count('too_many_requests')
+            self.send_json(429, {'code': 429, 'type': 'BLZWEBAPI00000429', 'detail': 'Too Many Requests'},
+                           {'Retry-After': '1'})
+            return
+        match = _REALM_AUCTIONS.match(url.path)
+        if match:
+            self.send_auctions(int(match.group(2)))
+            return
+        match = _COMMODITIES.match(url.path)
+        if match:
+            # regions are mapped to negative keys, so they do not share rotation with connected realms
+            self.send_auctions(-sum(map(ord, match.group(1))))
+            return
+        match = _REALM_SEARCH.match(url.path)
+        if match:
+            fake.count('realm_search')
+            slug_match = _REALM_SLUG.match(params.get('realms.slug', ''))
+            results = []
+            if slug_match:
+                realm_id = int(slug_match.group(1))
+                results.append({'data': {
+                    'id': realm_id,
+                    'realms': [{'name': {'en_US': f"Realm {realm_id}"}, 'slug': f"realm-{realm_id}"}]
+                }})
+            self.send_json(200, {'page': 1, 'pageCount': 1, 'results': results})
+            return
+        match = _ITEM.match(url.path)
+        if match:
+            fake.count('item')
+            item_id = int(match.group(2))
+            self.send_json(200, {'id': item_id, 'name': f"Item {item_id}", 'is_stackable': item_id % 2 == 0})
+            return
+        match = _ITEM_SEARCH.match(url.path)
+        if match:
+            fake.count('item_search')
+            name = params.get('name.en_US', '')
+            page_size = int(params.get('_pageSize', 5))
+            results = [{'data': {'id': 150_000 + i, 'name': {'en_US': f"{name} {i}"}, 'is_stackable': False}}
+                       for i in range(page_size)]
+            self.send_json(200, {'results': results})
+            return
+        self.send_json(404, {'detail': 'Not Found'})
+
+    def send_auctions(self, key: int):
+        fake = self.fake
+        dump, last_modified = fake.snapshot(key)
+        if_modified_since = self.headers.get('If-Modified-Since')
+        if if_modified_since:
+            try:
+                since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                since = None
+            if since is not None and last_modified <= since:
+                fake.count('not_modified')
+                self.send_response(304)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+        fake.count('auctions')
+        self.send_body(200, dump, {'Last-Modified': email.utils.formatdate(last_modified, usegmt=True)})
+
+
+class _TelegramHandler(_Handler):
+    fake: FakeTelegram
+
+    def do_POST(self):
+        body = self.read_body()
+        method = urlsplit(self.path).path.rsplit('/', 1)[-1]
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            data = {k: v[0] for k, v in parse_qs(body.decode('utf-8')).items()}
+        self.fake.count(method)
+        if method == 'getMe':
+            self.send_json(200, {'ok': True, 'result': {
+                'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'
+            }})
+            return
+        if method == 'sendMessage':
+            if self.fake.roll(self.fake.too_many_requests_rate):
+                self.fake.count('too_many_requests')
+                self.send_json(429, {
+                    'ok': False,
+                    'error_code': 429,
+                    'description': 'Too Many Requests: retry after 1',
+                    'parameters': {'retry_after': 1}
+                })
+                return
+            chat_id = int(data['chat_id'])
+            message_id = self.fake.record(chat_id, data.get('text', ''))
+            self.send_json(200, {'ok': True, 'result': {
+                'message_id': message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': data.get('text', '')
+            }})
+            return
+        self.send_json(200, {'ok': True, 'result': True})
+
+    do_GET = do_POST
+
+
+def _serve(port: int, fake, handler: type) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), type(handler.__name__, (handler,), {'fake': fake}))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake Battle.net and Telegram servers')
+    parser.add_argument('--blizzard-port', type=int, default=8081)
+    parser.add_argument('--telegram-port', type=int, default=8082)
+    parser.add_argument('--lots', type=int, default=10_000)
+    parser.add_argument('--rotation', type=int, default=60)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--unauthorized-rate', type=float, default=0.0)
+    parser.add_argument('--too-many-requests-rate', type=float, default=0.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    blizzard = FakeBlizzard(
+        args.lots,
+        rotation=args.rotation,
+        latency=args.latency,
+        unauthorized_rate=args.unauthorized_rate,
+        too_many_requests_rate=args.too_many_requests_rate
+    )
+    telegram = FakeTelegram(args.too_many_requests_rate)
+    blizzard.serve(args.blizzard_port)
+    telegram.serve(args.telegram_port)
+    logger.info(f"serving Battle.net on {args.blizzard_port}, Telegram on {args.telegram_port}")
+    try:
+        while True:
+            time.sleep(10)
+            logger.info(f"battle.net: {blizzard.counters}, telegram: {telegram.counters}")
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
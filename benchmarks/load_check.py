@@ -0,0 +1,183 @@
+"""
+Runs the check pipeline (`bot_jobs.check` and `bot_jobs.delivery`) against local fake Battle.net and Telegram servers
+and reports throughput and latency percentiles as JSON.
+
+    $ python benchmarks/load_check.py [--realms 1000] [--notifications 10000] [--lots 10000] [--cycles 3]
+        [--latency 0.02] [--unauthorized-rate 0.0] [--too-many-requests-rate 0.0] [--output results.json]
+
+Other settings are read from the environment as usual, `DELIVERY_RATE` defaults to 1000 here.
+"""
+import argparse
+import functools
+import json
+import logging
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import synthetic  # noqa: E402
+from fake_servers import FakeBlizzard, FakeTelegram  # noqa: E402
+
+DRAIN_TIMEOUT = 600
+
+
+def percentiles(values: list[float]) -> dict:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def at(p: float) -> float:
+        return values[max(math.ceil(p * len(values)) - 1, 0)]
+
+    return {'count': len(values), 'p50': at(0.5), 'p90': at(0.9), 'p99': at(0.99), 'max': values[-1]}
+
+
+class Timings:
+    """
+    Wraps fetch and evaluation stages of `bot_jobs.check` to record their durations.
+    """
+
+    def __init__(self, check):
+        self.fetch: list[float] = []
+        self.evaluate: list[float] = []
+        self.check: list[float] = []  # from fetch start to evaluation end, including time spent in the queue
+        self.failed = 0
+        self._started: dict[int, float] = {}
+        self._lock = threading.Lock()
+        fetch_auctions = check._fetch_auctions
+        evaluate_auctions = check._evaluate_auctions
+
+        @functools.wraps(fetch_auctions)
+        def timed_fetch(auction_schedule, *args, **kwargs):
+            start = time.perf_counter()
+            with self._lock:
+                self._started[id(auction_schedule)] = start
+            try:
+                return fetch_auctions(auction_schedule, *args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.failed += 1
+                    self._started.pop(id(auction_schedule), None)
+                raise
+            finally:
+                with self._lock:
+                    self.fetch.append(time.perf_counter() - start)
+
+        @functools.wraps(evaluate_auctions)
+        def timed_evaluate(auction_schedule, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return evaluate_auctions(auction_schedule, *args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                with self._lock:
+                    self.evaluate.append(end - start)
+                    started = self._started.pop(id(auction_schedule), None)
+                    if started is not None:
+                        self.check.append(end - started)
+
+        check._fetch_auctions = timed_fetch
+        check._evaluate_auctions = timed_evaluate
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check pipeline load test')
+    parser.add_argument('--realms', type=int, default=1000)
+    parser.add_argument('--notifications', type=int, default=10_000)
+    parser.add_argument('--lots', type=int, default=10_000)
+    parser.add_argument('--cycles', type=int, default=3)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--unauthorized-rate', type=float, default=0.0)
+    parser.add_argument('--too-many-requests-rate', type=float, default=0.0)
+    parser.add_argument('--output', help='path of JSON results')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    blizzard = FakeBlizzard(
+        args.lots,
+        rotation=3600,
+        latency=args.latency,
+        unauthorized_rate=args.unauthorized_rate,
+        too_many_requests_rate=args.too_many_requests_rate
+    )
+    telegram = FakeTelegram(args.too_many_requests_rate)
+    blizzard_server = blizzard.serve(0)
+    telegram_server = telegram.serve(0)
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ.setdefault('DELIVERY_RATE', '1000')
+    os.environ.update({
+        'DATABASE': os.path.join(tmp.name, 'load.db'),
+        'TELEGRAM_BOT_TOKEN': '123:load',
+        'TELEGRAM_API_URL': f"http://127.0.0.1:{telegram_server.server_port}/bot",
+        'BNET_CLIENT_ID': 'load',
+        'BNET_CLIENT_SECRET': 'load',
+        'BNET_TOKEN_URL': f"http://127.0.0.1:{blizzard_server.server_port}/token",
+        'BNET_API_URL': f"http://127.0.0.1:{blizzard_server.server_port}/%s",
+    })
+
+    from telegram.ext import Updater
+    from bot_context import BotContext
+    from bot_jobs import check, delivery
+
+    bot_env = BotContext.get().bot_env
+    db = BotContext.get().database
+    synthetic.populate(db, args.notifications, args.realms)
+    timings = Timings(check)
+    updater = Updater(token=bot_env.bot_token, base_url=bot_env.telegram_api_url)
+    check.register(updater.dispatcher)
+    delivery.register(updater.dispatcher)
+
+    cycles = []
+    for cycle in range(args.cycles):
+        checks = len(timings.check)
+        start = time.perf_counter()
+        # the first cycle is due by the new schedules, later cycles are forced
+        check._check_all(force=cycle > 0)
+        while check._in_progress:
+            time.sleep(0.05)
+        duration = time.perf_counter() - start
+        checks = len(timings.check) - checks
+        cycles.append({'duration': duration, 'checks': checks, 'checks_per_second': checks / duration})
+        print(f"cycle {cycle}: {checks} checks in {duration:.2f}s", file=sys.stderr)
+
+    start = time.perf_counter()
+    while db.get_outbox_messages(2 ** 62, 1) and time.perf_counter() - start < DRAIN_TIMEOUT:
+        time.sleep(0.1)
+    messages = telegram.messages
+    delivery_duration = messages[-1][0] - messages[0][0] if len(messages) > 1 else 0
+
+    report = {
+        'realms': args.realms,
+        'notifications': args.notifications,
+        'lots': args.lots,
+        'latency': args.latency,
+        'cycles': cycles,
+        'fetch': percentiles(timings.fetch),
+        'evaluate': percentiles(timings.evaluate),
+        'check': percentiles(timings.check),
+        'failed': timings.failed,
+        'delivered': len(messages),
+        'delivered_per_second': len(messages) / delivery_duration if delivery_duration else None,
+        'blizzard': blizzard.counters,
+        'telegram': telegram.counters
+    }
+    db.close()
+    BotContext.get().wow_game_api.close()
+    blizzard_server.shutdown()
+    telegram_server.shutdown()
+    tmp.cleanup()
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Deterministic generator of realistic auction dumps and notification sets for benchmarks.
+"""
+import itertools
+import json
+import random
+
+from db.database import Database
+from model.notification import Notification
+
+ITEMS = 20_000
+# Zipf exponent of item popularity: a few items make up most of the lots
+POPULARITY_SKEW = 1.1
+REALM_ID = 1
+REGION = 'eu'
+LAST_MODIFIED = 'Tue, 14 Nov 2023 22:13:20 GMT'
+
+
+def item_weights() -> list[float]:
+    return list(itertools.accumulate(1 / rank ** POPULARITY_SKEW for rank in range(1, ITEMS + 1)))
+
+
+def item_id(rank: int) -> int:
+    """
+    Maps popularity rank (starting from 0) to a realistic looking item id.
+    """
+    return 150_000 + rank * 7
+
+
+def generate_dump(lots: int, seed: int = 0) -> bytes:
+    """
+    Returns connected realm auction data with `lots` lots. Commodity-like popular items get few distinct prices
+    around a base price, rare items get scattered prices.
+    """
+    rnd = random.Random(seed)
+    ranks = rnd.choices(range(ITEMS), cum_weights=item_weights(), k=lots)
+    auctions = []
+    for i, rank in enumerate(ranks):
+        base_price = 1000 + (rank * 7919) % 1_000_000
+        auction = {'id': i, 'item': {'id': item_id(rank)}, 'quantity': rnd.randint(1, 200), 'time_left': 'LONG'}
+        if rank < 100:
+            auction['unit_price'] = base_price + rnd.randint(0, 50) * 100
+        else:
+            auction['buyout'] = int(base_price * rnd.uniform(0.5, 3))
+        auctions.append(auction)
+    return json.dumps({
+        '_links': {'self': {'href': f"https://{REGION}.api.blizzard.com/data/wow/connected-realm/{REALM_ID}/auctions"}},
+        'connected_realm': {'href': f"https://{REGION}.api.blizzard.com/data/wow/connected-realm/{REALM_ID}"},
+        'auctions': auctions
+    }).encode('utf-8')
+
+
+def populate(db: Database, notifications: int, realms: int = 1, seed: int = 0):
+    """
+    Adds `notifications` notifications for popular and long tail items, spread over connected realms with ids
+    from 1 to `realms` (with slugs `realm-<id>`) and created by `notifications / 10` users.
+    """
+    rnd = random.Random(seed)
+    db.migrate()
+    for realm_id in range(REALM_ID, REALM_ID + realms):
+        db.add_connected_realm(realm_id, REGION, f"realm-{realm_id}", f"Realm {realm_id}")
+    watched = sorted(set(rnd.choices(range(ITEMS), cum_weights=item_weights(), k=min(notifications, 2000))))
+    for rank in watched:
+        db.add_item(item_id(rank), f"Item {rank}")
+    users = max(notifications // 10, 1)
+    for telegram_id in range(1, users + 1):
+        db.add_user(telegram_id)
+    # stored the same way as by the /add command
+    kinds = [kind.value[0] for kind in Notification.Kind]
+    for _ in range(notifications):
+        rank = rnd.choice(watched)
+        base_price = 1000 + (rank * 7919) % 1_000_000
+        db.add_notification(
+            rnd.randint(1, users),
+            rnd.randint(REALM_ID, REALM_ID + realms - 1),
+            item_id(rank),
+            rnd.choice(kinds),
+            int(base_price * rnd.uniform(0.8, 1.5)),
+            rnd.randint(1, 50)
+        )
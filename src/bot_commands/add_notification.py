@@ -10,7 +10,9 @@ from bot_context import BotContext
 from db.database import Item
 from model.connected_realm import ConnectedRealm
 from model.notification import Notification
+from model.realm import Realm
 from utils import from_human_price, to_human_price, wowhead_link, sanitize_str
+from wow.realm_catalog import slugify
 from wow.wow_game_api import REGIONS
 
 MAX_USER_REALMS = 3
@@ -18,6 +20,7 @@ MAX_USER_REALMS = 3
 MIN_PRICE = 100  # 1 silver
 MAX_PRICE = 2_000_000 * 10000  # 2 mil gold
 VALUE_UPPER_BOUND = 50000
+MAX_ITEM_RESULTS = 8
 
 STAGE_REGION = 0
 STAGE_REALM = 1
@@ -135,9 +138,8 @@ def _select_realm(update: Update, context: CallbackContext):
     else:
         context.bot.send_chat_action(chat_id=update.effective_message.chat_id, action=ChatAction.TYPING)
 
-        slug = update.message.text.replace('\'', '').replace(' ', '-').lower()
         region = context.user_data[KEY_REGION]
-        realm = _get_connected_realm(region, slug)
+        realm = _get_connected_realm(region, update.message.text[:64])
         if not realm:
             update.effective_user.send_message(f"Error: can't find realm")
             return STAGE_REALM
@@ -284,7 +286,7 @@ def _add_notification(update, user_data):
 
     db = BotContext.get().database
     if not db.get_item(item.item_id):
-        db.add_item(item.item_id, item.name)
+        db.add_item(item.item_id, item.name, item.commodity)
     if not db.get_connected_realm_by_id(realm.connected_realm_id):
         db.add_connected_realm(realm.connected_realm_id, realm.region, realm.slug, realm.name)
     db.add_notification(user.user_id, realm.connected_realm_id, item.item_id, kind.value[0], price, value)
@@ -320,13 +322,19 @@ def _get_or_create_user(telegram_id: int):
         return db.get_user(telegram_id)
 
 
-def _get_connected_realm(region: str, slug: str) -> Optional[ConnectedRealm]:
-    db = BotContext.get().database
-    realm = db.get_connected_realm(region, slug)
+def _get_connected_realm(region: str, name: str) -> Optional[ConnectedRealm]:
+    catalog = BotContext.get().realm_catalog
+    realm = catalog.resolve(region, name)
     if realm:
         return realm
+    # the realm catalog is not loaded yet or the realm is new
+    slug = slugify(name)
+    if not slug:
+        return None
     api = BotContext.get().wow_game_api
     realm = api.with_retry(lambda: api.connected_realm(region, slug))
+    if realm:
+        catalog.update(region, [Realm(region, realm.slug, realm.name, realm.connected_realm_id)])
     return realm
 
 
@@ -335,16 +343,34 @@ def _get_item_info(realm: ConnectedRealm, item_id: int) -> Optional[Item]:
     item = db.get_item(item_id)
     if item:
         return item
-    api = BotContext.get().wow_game_api
-    item = api.with_retry(lambda: api.item_info_by_id(realm.region, item_id))
-    return item
+    item = BotContext.get().item_catalog.item(item_id)
+    if item:
+        return item
+    return BotContext.get().item_cache.item_info_by_id(realm.region, item_id)
 
 
 def _get_item_infos_by_name(realm: ConnectedRealm, item_name: str) -> list[Item]:
-    api = BotContext.get().wow_game_api
-    items = api.with_retry(lambda: api.item_info_by_name(realm.region, item_name))
+    catalog = BotContext.get().item_catalog
+    items = catalog.search(item_name, MAX_ITEM_RESULTS)
+    exact = _exact_match(items, item_name)
+    if exact:
+        return [exact]
+    # the catalog may be filled only partially, Battle.net API results are merged unless the name matched exactly
+    found = BotContext.get().item_cache.item_info_by_name(realm.region, item_name)
+    ids = {item.item_id for item in items}
+    new_items = [item for item in found if item.item_id not in ids]
+    items = items[:MAX_ITEM_RESULTS - len(new_items)] + new_items
+    exact = _exact_match(items, item_name)
+    if exact:
+        return [exact]
+    if len(items) == 0:
+        # neither the catalog nor the API know the name, it may have a typo
+        items = catalog.search_similar(item_name, MAX_ITEM_RESULTS)
+    return items
+
+
+def _exact_match(items: list[Item], item_name: str) -> Optional[Item]:
     for item in items:
         if item_name.lower() == item.name.lower():
-            # exact match
-            return [item]
-    return items
+            return item
+    return None
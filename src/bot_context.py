@@ -1,5 +1,11 @@
 from bot_env import BotEnv
 from db.database import Database
+from wow.http_pool import HttpPool
+from wow.item_cache import ItemCache
+from wow.item_catalog import ItemCatalog
+from wow.parse_pool import ParsePool
+from wow.realm_catalog import RealmCatalog
+from wow.snapshot_cache import SnapshotCache
 from wow.wow_game_api import WowGameApi
 
 
@@ -7,11 +13,44 @@ class BotContext:
     bot_env: BotEnv
     wow_game_api: WowGameApi
     database: Database
+    realm_catalog: RealmCatalog
+    item_catalog: ItemCatalog
+    item_cache: ItemCache
 
     def __init__(self):
         self.bot_env = BotEnv()
-        self.wow_game_api = WowGameApi(self.bot_env.bnet_client_id, self.bot_env.bnet_client_secret)
+        http_pool = HttpPool(
+            self.bot_env.http_connect_timeout,
+            self.bot_env.http_read_timeout,
+            self.bot_env.http_pool_size
+        )
+        parse_pool = None
+        if self.bot_env.parse_processes > 0:
+            parse_pool = ParsePool(self.bot_env.parse_processes)
+        snapshots = None
+        if self.bot_env.snapshot_dir:
+            snapshots = SnapshotCache(self.bot_env.snapshot_dir, self.bot_env.snapshot_cache_size * 1024 * 1024)
+        self.wow_game_api = WowGameApi(
+            self.bot_env.bnet_client_id,
+            self.bot_env.bnet_client_secret,
+            http_pool,
+            snapshots,
+            self.bot_env.bnet_token_url,
+            self.bot_env.bnet_api_url,
+            self.bot_env.bnet_rate_limit,
+            self.bot_env.bnet_hourly_limit,
+            parse_pool
+        )
         self.database = Database(self.bot_env.database)
+        self.realm_catalog = RealmCatalog(self.database)
+        self.item_catalog = ItemCatalog(self.database)
+        self.item_cache = ItemCache(
+            self.wow_game_api,
+            self.database,
+            self.item_catalog,
+            self.bot_env.item_cache_size,
+            self.bot_env.item_cache_ttl * 60 * 60
+        )
 
     @staticmethod
     def get() -> 'BotContext':
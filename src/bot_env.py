@@ -1,4 +1,7 @@
 import os
+from typing import Optional
+
+from wow.wow_game_api import TOKEN_URL, DATA_URL, RATE_LIMIT, HOURLY_LIMIT
 
 
 class BotEnv:
@@ -6,13 +9,63 @@ class BotEnv:
     database: str
     bnet_client_id: str
     bnet_client_secret: str
+    bnet_token_url: str
+    bnet_api_url: str
+    bnet_rate_limit: float
+    bnet_hourly_limit: int
+    telegram_api_url: Optional[str]
     max_notifications: int
     update_interval: int
+    http_connect_timeout: float
+    http_read_timeout: float
+    http_pool_size: int
+    fetch_concurrency: int
+    fetch_host_concurrency: int
+    evaluation_queue_size: int
+    parse_processes: int
+    delivery_rate: float
+    delivery_chat_rate: float
+    renotify_interval: int
+    snapshot_dir: Optional[str]
+    snapshot_cache_size: int
+    history_hourly_retention: int
+    history_retention: int
+    metrics_port: Optional[int]
+    item_cache_size: int
+    item_cache_ttl: int
+    tracing: bool
+    trace_profile: bool
+    trace_dir: str
 
     def __init__(self):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.database = os.getenv('DATABASE')
         self.bnet_client_id = os.getenv('BNET_CLIENT_ID')
         self.bnet_client_secret = os.getenv('BNET_CLIENT_SECRET')
+        self.bnet_token_url = os.getenv('BNET_TOKEN_URL', TOKEN_URL)
+        self.bnet_api_url = os.getenv('BNET_API_URL', DATA_URL)
+        self.bnet_rate_limit = float(os.getenv('BNET_RATE_LIMIT', str(RATE_LIMIT)))
+        self.bnet_hourly_limit = int(os.getenv('BNET_HOURLY_LIMIT', str(HOURLY_LIMIT)))
+        self.telegram_api_url = os.getenv('TELEGRAM_API_URL')
         self.max_notifications = int(os.getenv('MAX_NOTIFICATIONS', '10'))
         self.update_interval = int(os.getenv('UPDATE_INTERVAL', '60'))
+        self.http_connect_timeout = float(os.getenv('HTTP_CONNECT_TIMEOUT', '5'))
+        self.http_read_timeout = float(os.getenv('HTTP_READ_TIMEOUT', '30'))
+        self.http_pool_size = int(os.getenv('HTTP_POOL_SIZE', '10'))
+        self.fetch_concurrency = int(os.getenv('FETCH_CONCURRENCY', '16'))
+        self.fetch_host_concurrency = int(os.getenv('FETCH_HOST_CONCURRENCY', '8'))
+        self.evaluation_queue_size = int(os.getenv('EVALUATION_QUEUE_SIZE', '8'))
+        self.parse_processes = int(os.getenv('PARSE_PROCESSES', '0'))
+        self.delivery_rate = float(os.getenv('DELIVERY_RATE', '25'))
+        self.delivery_chat_rate = float(os.getenv('DELIVERY_CHAT_RATE', '1'))
+        self.renotify_interval = int(os.getenv('RENOTIFY_INTERVAL', '360'))
+        self.snapshot_dir = os.getenv('SNAPSHOT_DIR')
+        self.snapshot_cache_size = int(os.getenv('SNAPSHOT_CACHE_SIZE', '1024'))
+        self.history_hourly_retention = int(os.getenv('HISTORY_HOURLY_RETENTION', '14'))
+        self.history_retention = int(os.getenv('HISTORY_RETENTION', '365'))
+        self.metrics_port = int(os.getenv('METRICS_PORT')) if os.getenv('METRICS_PORT') else None
+        self.item_cache_size = int(os.getenv('ITEM_CACHE_SIZE', '10000'))
+        self.item_cache_ttl = int(os.getenv('ITEM_CACHE_TTL', '168'))
+        self.tracing = os.getenv('TRACING') == '1'
+        self.trace_profile = os.getenv('TRACE_PROFILE') == '1'
+        self.trace_dir = os.getenv('TRACE_DIR', 'traces')
@@ -1,77 +1,153 @@
 import concurrent.futures
-import datetime
+import email.utils
+import functools
 import logging
-import random
+import math
 import threading
 import time
+from typing import Optional
 
 from telegram import Update, ChatAction
-from telegram.constants import PARSEMODE_MARKDOWN_V2
 from telegram.ext import Dispatcher, CallbackContext, CommandHandler
 
+import metrics
+import tracing
 from bot_context import BotContext
+from bot_jobs import schedule, delivery, history
+from bot_jobs.fetch_engine import FetchEngine
+from model.alert_state import AlertState
 from model.auction import Auction
+from model.commodity_schedule import CommoditySchedule
 from model.notification import Notification
+from model.notification_target import NotificationTarget
+from model.order_book import OrderBook
 from utils import to_human_price, wowhead_link, sanitize_str
+from wow.wow_game_api import auction_source
 
 logger = logging.getLogger(__name__)
-executor = concurrent.futures.ThreadPoolExecutor(max_workers=4)
 
-MAX_RETRIES = 15
-SLEEP_INTERVAL = 300
+TICK_INTERVAL = 60
+EVALUATION_WORKERS = 4
+# relative change of quantity and price, which is considered meaningful for repeated alerts
+QTY_BUCKET_BASE = 1.25
+PRICE_BUCKET_BASE = 1.05
 
+_engine: Optional[FetchEngine] = None
 
-def register(dispatcher: Dispatcher):
-    threading.Thread(name='pick-interval', target=_pick_interval, args=[dispatcher], daemon=True).start()
-    dispatcher.add_handler(CommandHandler("checknow", _check_now))
+# connected realm ids and commodities regions currently being checked
+_in_progress: set = set()
+_in_progress_lock = threading.Lock()
 
+# connected realm id or commodities region -> last modified timestamp of the evaluated auction data and ids of
+# notifications evaluated against it, empty after a start
+_evaluated: dict = {}
+_evaluated_lock = threading.Lock()
+# connected realm id or commodities region -> last re-evaluation submitted before the schedule was due, so a failing
+# re-evaluation is not repeated on every tick
+_reevaluations: dict = {}
 
-def _pick_interval(dispatcher: Dispatcher):
-    logger.debug('Starting _pick_interval')
-    api = BotContext.get().wow_game_api
-    db = BotContext.get().database
-    realms = db.get_all_connected_realms()
-    if len(realms) == 0:
-        logger.debug('_pick_interval: no available realms')
-        _schedule_job(dispatcher)
-        return
-    realm = random.choice(realms)
-    prev_hash = None
-    retries = 0
-    while retries < MAX_RETRIES:
-        retries += 1
-        new_hash = api.with_retry(lambda: api.auctions_snapshot(realm.region, realm.connected_realm_id))
-        logger.debug(f"_pick_interval: prev_hash={prev_hash} new_hash={new_hash}")
-        if not new_hash:
-            # no snapshot available
-            continue
-        if not prev_hash:
-            prev_hash = new_hash
-        elif prev_hash != new_hash:
-            logger.debug('_pick_interval: auction data updated')
-            # auction data got an update
-            break
-        logger.debug(f"_pick_interval: retries left: {MAX_RETRIES - retries}")
-        time.sleep(SLEEP_INTERVAL)
-    _schedule_job(dispatcher)
+_EVALUATED = metrics.Counter('wow_notifications_evaluated_total', 'Evaluated notifications', ('source',))
+_TRIGGERED = metrics.Counter(
+    'wow_notifications_triggered_total', 'Notifications, which conditions were met', ('source',))
+_SUPPRESSED = metrics.Counter(
+    'wow_notifications_suppressed_total', 'Triggered notifications suppressed as unchanged', ('source',))
+_EVALUATE_SECONDS = metrics.Histogram('wow_evaluate_seconds', 'Time to evaluate auction data', ('source',))
+_EVALUATION_LAG = metrics.Histogram(
+    'wow_evaluation_lag_seconds',
+    'Time from auction data last modification to its evaluation',
+    ('source',),
+    metrics.LAG_BUCKETS
+)
+metrics.Gauge(
+    'wow_evaluation_queue_size',
+    'Fetched auction data waiting for evaluation',
+    lambda: _engine.queue_size() if _engine else 0
+)
+metrics.Gauge('wow_checks_in_progress', 'Auction data being fetched or evaluated', lambda: len(_in_progress))
 
 
-def _schedule_job(dispatcher: Dispatcher):
-    logger.info('Schedule update job')
-    dispatcher.job_queue.run_repeating(
-        _callback,
-        first=1,
-        interval=datetime.timedelta(minutes=BotContext.get().bot_env.update_interval))
+def register(dispatcher: Dispatcher):
+    global _engine
+    bot_env = BotContext.get().bot_env
+    _engine = FetchEngine(
+        bot_env.fetch_concurrency,
+        bot_env.fetch_host_concurrency,
+        bot_env.evaluation_queue_size,
+        EVALUATION_WORKERS
+    )
+    dispatcher.job_queue.run_repeating(_callback, first=1, interval=TICK_INTERVAL)
+    dispatcher.add_handler(CommandHandler("checknow", _check_now))
+    dispatcher.add_handler(CommandHandler("trace", _trace))
 
 
 def _callback(context: CallbackContext):
+    _check_all(force=False)
+
+
+def _check_all(force: bool):
     db = BotContext.get().database
-    by_realms = {}
-    for notification in db.get_notifications():
-        lst = by_realms.setdefault(notification.connected_realm_id, [])
-        lst.append(notification)
-    for realm_id, notifications in by_realms.items():
-        executor.submit(_check_and_notify, context, realm_id, notifications)
+    realm_schedules = {s.connected_realm_id: s for s in db.get_realm_schedules()}
+    commodity_schedules = {s.region: s for s in db.get_commodity_schedules()}
+    default_interval = BotContext.get().bot_env.update_interval * 60
+    now = int(time.time())
+    submitted = 0
+    cycle = tracing.start_trace('cycle', force=force)
+    commodity_targets: dict[str, list[NotificationTarget]] = {}
+    for realm, targets in db.get_notification_targets():
+        # items with unknown type are looked up in both realm and commodities auction data
+        realm_targets = [t for t in targets if not t.commodity]
+        commodity_targets.setdefault(realm.region, []).extend(t for t in targets if t.commodity is not False)
+        if len(realm_targets) == 0:
+            continue
+        realm_id = realm.connected_realm_id
+        realm_schedule = realm_schedules.get(realm_id) or schedule.new_schedule(realm_id, default_interval)
+        if _submit(realm_id, realm.region, realm_schedule, realm_targets, force, now, cycle):
+            submitted += 1
+    for region, targets in commodity_targets.items():
+        if len(targets) == 0:
+            continue
+        commodity_schedule = commodity_schedules.get(region) or schedule.new_commodity_schedule(
+            region, default_interval)
+        if _submit(region, region, commodity_schedule, targets, force, now, cycle):
+            submitted += 1
+    if cycle:
+        cycle.end(submitted=submitted)
+    if submitted > 0:
+        for host, stats in BotContext.get().wow_game_api.connection_stats().items():
+            logger.info(f"http pool {host}: {stats}")
+
+
+def _submit(
+        key,
+        region: str,
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        force: bool,
+        now: int,
+        cycle: Optional[tracing.Span] = None
+) -> bool:
+    reevaluation = None
+    if not force and not schedule.is_due(auction_schedule, now):
+        # with the snapshot cache, notifications not evaluated yet are evaluated without waiting for the next publish
+        if not BotContext.get().bot_env.snapshot_dir or not auction_schedule.last_modified:
+            return False
+        reevaluation = (auction_schedule.last_modified, frozenset(t.notification.n_id for t in targets))
+        if not _is_unevaluated(auction_schedule, targets) or _reevaluations.get(key) == reevaluation:
+            return False
+    with _in_progress_lock:
+        if key in _in_progress:
+            return False
+        _in_progress.add(key)
+    if reevaluation:
+        _reevaluations[key] = reevaluation
+    span = cycle.child('check', schedule=str(auction_schedule), targets=len(targets)) if cycle else None
+    future = _engine.submit(
+        region,
+        tracing.wrap(span, 'fetch', functools.partial(_fetch_stage, auction_schedule, targets, force)),
+        tracing.wrap(span, 'evaluate', functools.partial(_evaluate_stage, auction_schedule, targets, force))
+    )
+    future.add_done_callback(functools.partial(_on_check_done, key, auction_schedule, span))
+    return True
 
 
 def _check_now(update: Update, context: CallbackContext):
@@ -79,132 +155,311 @@ def _check_now(update: Update, context: CallbackContext):
     user = BotContext.get().database.get_user(user_id)
     if user and user.level == 1:
         context.bot.send_chat_action(chat_id=update.effective_message.chat_id, action=ChatAction.TYPING)
-        _callback(context)
+        _check_all(force=True)
+
+
+def _trace(update: Update, context: CallbackContext):
+    """
+    Toggles cycle tracing: `/trace on [profile]` or `/trace off`.
+    """
+    user_id = update.effective_user.id
+    user = BotContext.get().database.get_user(user_id)
+    if not user or user.level != 1:
+        return
+    args = context.args or []
+    enabled = len(args) > 0 and args[0] == 'on'
+    profile = enabled and 'profile' in args[1:]
+    tracing.configure(enabled, profile, BotContext.get().bot_env.trace_dir)
+    update.effective_user.send_message(f"Tracing is {'on' if enabled else 'off'}{', profiling' if profile else ''}")
 
 
-def _check_and_notify(context: CallbackContext, connected_realm_id: int, notifications: list[Notification]):
+def _on_check_done(
+        key,
+        auction_schedule: schedule.Schedule,
+        span: Optional[tracing.Span],
+        future: concurrent.futures.Future
+):
+    # runs on the event loop thread of the fetch engine, the failed schedule is saved by `_evaluate_stage`
     try:
-        _check_and_notify_unsafe(context, connected_realm_id, notifications)
+        e = future.exception()
+        if e:
+            logger.error(f"_check_and_notify failed: {e}", exc_info=e)
+    finally:
+        with _in_progress_lock:
+            _in_progress.discard(key)
+        if span:
+            span.end(failed=future.exception() is not None)
+
+
+def _check_and_notify_unsafe(
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        force: bool = False
+):
+    snapshot = _fetch_auctions(auction_schedule, targets, force)
+    _evaluate_auctions(auction_schedule, targets, force, snapshot)
+
+
+def _fetch_stage(
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        force: bool
+) -> tuple[Optional[tuple[Optional[dict[int, Auction]], Optional[int]]], Optional[Exception]]:
+    """
+    Runs `_fetch_auctions` in a fetch thread. Its failure is returned to `_evaluate_stage`, which backs off the schedule
+    in an evaluation thread.
+    """
+    try:
+        return _fetch_auctions(auction_schedule, targets, force), None
     except Exception as e:
-        logger.error(f"_check_and_notify failed: {e}", exc_info=e)
+        return None, e
+
+
+def _evaluate_stage(
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        force: bool,
+        fetched: tuple[Optional[tuple[Optional[dict[int, Auction]], Optional[int]]], Optional[Exception]]
+):
+    snapshot, error = fetched
+    try:
+        if error:
+            raise error
+        _evaluate_auctions(auction_schedule, targets, force, snapshot)
+    except Exception:
+        schedule.on_unchanged(auction_schedule, int(time.time()))
+        _save_schedule(auction_schedule)
+        raise
 
 
-def _check_and_notify_unsafe(context: CallbackContext, connected_realm_id: int, notifications: list[Notification]):
+def _fetch_auctions(
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        force: bool
+) -> tuple[Optional[dict[int, Auction]], Optional[int]]:
+    """
+    Returns auction data of the watched items (or `None`, if it was not modified since the last evaluation) and its
+    last modified timestamp. If some of the notifications were not evaluated against the last auction data, it is
+    requested unconditionally, so it is read from the snapshot cache, if it is still there.
+    """
     api = BotContext.get().wow_game_api
+    item_ids = list({t.notification.item_id for t in targets})
+    if_modified_since = None
+    if not force and auction_schedule.last_modified and not _is_unevaluated(auction_schedule, targets):
+        if_modified_since = email.utils.formatdate(auction_schedule.last_modified, usegmt=True)
+    if isinstance(auction_schedule, CommoditySchedule):
+        region = auction_schedule.region
+        auctions = api.with_retry(lambda: api.commodities(region, item_ids, if_modified_since))
+        return auctions, _parse_http_date(api.commodities_last_modified(region))
+    connected_realm_id = auction_schedule.connected_realm_id
+    region = targets[0].realm.region
+    auctions = api.with_retry(lambda: api.auctions(region, connected_realm_id, item_ids, if_modified_since))
+    return auctions, _parse_http_date(api.last_modified(connected_realm_id))
+
+
+def _evaluate_auctions(
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        force: bool,
+        snapshot: tuple[Optional[dict[int, Auction]], Optional[int]]
+):
+    auctions, last_modified = snapshot
+    updated = auctions is not None and last_modified is not None and (
+            not auction_schedule.last_modified or last_modified > auction_schedule.last_modified)
+    # the last evaluated auction data again, e.g. after a start or for new notifications
+    current = updated or (
+            auctions is not None and last_modified is not None and last_modified == auction_schedule.last_modified)
+    if not updated and not force and not (current and _is_unevaluated(auction_schedule, targets)):
+        logger.info(f"auction data for {auction_schedule} is not updated, skipping")
+        schedule.on_unchanged(auction_schedule, int(time.time()))
+        _save_schedule(auction_schedule)
+        return
+    start = time.perf_counter()
+    _update_commodity_items(auction_schedule, targets, auctions)
     db = BotContext.get().database
-    item_names = _get_item_names(notifications)
-    realm = db.get_connected_realm_by_id(connected_realm_id)
-    item_ids = [n.item_id for n in notifications]
-    auctions = api.with_retry(lambda: api.auctions(realm.region, connected_realm_id, item_ids))
+    commodities = isinstance(auction_schedule, CommoditySchedule)
+    if commodities:
+        source = auction_source(auction_schedule.region)
+    else:
+        source = auction_source(targets[0].realm.region, auction_schedule.connected_realm_id)
+    renotify_interval = BotContext.get().bot_env.renotify_interval * 60
+    alert_states = db.get_alert_states([t.notification.n_id for t in targets])
+    fired_alerts = []
+    cleared_alerts = []
+    now = int(time.time())
     sent_notifications = 0
-    for notification in notifications:
-        user = db.get_user_by_id(notification.user_id)
-        if not user:
-            logger.warning(f"User id={notification.user_id} has active notifications, but not found in the database")
-            continue
+    suppressed_notifications = 0
+    # only watched items are parsed, so every book is used by a notification or price history
+    with tracing.span('order_books', items=len(auctions)):
+        books = {item_id: OrderBook(auction) for item_id, auction in auctions.items()}
+    if updated:
+        _EVALUATION_LAG.observe(now - last_modified, source)
+        with tracing.span('history'):
+            if commodities:
+                history.record(auction_schedule.region, 0, auctions, books, last_modified)
+            else:
+                region = targets[0].realm.region
+                history.record(region, auction_schedule.connected_realm_id, auctions, books, last_modified)
+    evaluated = 0
+    for target in targets:
+        notification = target.notification
         if notification.item_id not in auctions:
+            # items of unknown type may still be listed in the other auction data, failed fetches are not conclusive
+            if updated and target.commodity == commodities and notification.n_id in alert_states:
+                cleared_alerts.append(notification.n_id)
             continue
-        auction = auctions[notification.item_id]
-        item_name = item_names[notification.item_id]
+        book = books[notification.item_id]
+        evaluated += 1
         if notification.kind == Notification.Kind.MAX_PRICE:
-            sent = _check_min_qty(context, notification, auction, item_name, user.telegram_id, realm.name)
+            alert = _check_min_qty(notification, book, target.item_name, target.realm.name)
         elif notification.kind == Notification.Kind.MARKET_PRICE:
-            sent = _check_market_price(context, notification, auction, item_name, user.telegram_id, realm.name)
+            alert = _check_market_price(notification, book, target.item_name, target.realm.name)
         elif notification.kind == Notification.Kind.AVG_PRICE:
-            sent = _check_average(context, notification, auction, item_name, user.telegram_id, realm.name)
+            alert = _check_average(notification, book, target.item_name, target.realm.name)
         else:
             logger.warning(f"{notification.kind.value} is not supported")
             continue
-        if sent:
-            sent_notifications += 1
-    logger.info(
-        f"sent {sent_notifications}/{len(notifications)} notifications for connected_realm_id={connected_realm_id}"
-    )
+        alert_state = alert_states.get(notification.n_id)
+        if not alert:
+            if alert_state:
+                cleared_alerts.append(notification.n_id)
+            continue
+        text, fingerprint = alert
+        if alert_state and alert_state.fingerprint == fingerprint and now - alert_state.fired_at < renotify_interval:
+            suppressed_notifications += 1
+            continue
+        delivery.enqueue(target.telegram_id, text, last_modified)
+        fired_alerts.append(AlertState(notification.n_id, fingerprint, now))
+        sent_notifications += 1
+    with tracing.span('alert_states', fired=len(fired_alerts), cleared=len(cleared_alerts)):
+        db.set_alert_states(fired_alerts)
+        db.delete_alert_states(cleared_alerts)
+    _EVALUATED.inc(source, amount=evaluated)
+    _TRIGGERED.inc(source, amount=sent_notifications + suppressed_notifications)
+    _SUPPRESSED.inc(source, amount=suppressed_notifications)
+    _EVALUATE_SECONDS.observe(time.perf_counter() - start, source)
+    logger.info(f"sent {sent_notifications}/{len(targets)} notifications for {auction_schedule}, "
+                f"{suppressed_notifications} suppressed as unchanged")
+    if current:
+        with _evaluated_lock:
+            _evaluated[_schedule_key(auction_schedule)] = (last_modified, {t.notification.n_id for t in targets})
+    if updated:
+        schedule.on_updated(auction_schedule, last_modified, int(time.time()))
+        _save_schedule(auction_schedule)
+    elif schedule.is_due(auction_schedule, now):
+        # unchanged auction data was evaluated by a due check, e.g. the first one after a start
+        schedule.on_unchanged(auction_schedule, int(time.time()))
+        _save_schedule(auction_schedule)
+
+
+def _schedule_key(auction_schedule: schedule.Schedule):
+    if isinstance(auction_schedule, CommoditySchedule):
+        return auction_schedule.region
+    return auction_schedule.connected_realm_id
+
+
+def _is_unevaluated(auction_schedule: schedule.Schedule, targets: list[NotificationTarget]) -> bool:
+    """
+    Returns `True`, if any of the notifications was not evaluated against the last auction data of the schedule.
+    """
+    if not auction_schedule.last_modified:
+        return True
+    with _evaluated_lock:
+        evaluated = _evaluated.get(_schedule_key(auction_schedule))
+    if not evaluated or evaluated[0] != auction_schedule.last_modified:
+        return True
+    return any(t.notification.n_id not in evaluated[1] for t in targets)
+
+
+def _update_commodity_items(
+        auction_schedule: schedule.Schedule,
+        targets: list[NotificationTarget],
+        auctions: dict[int, Auction]
+):
+    """
+    Stores the type of items with unknown type, which were found in auction data.
+    """
+    found = {t.notification.item_id for t in targets if t.commodity is None and t.notification.item_id in auctions}
+    if len(found) == 0:
+        return
+    commodity = isinstance(auction_schedule, CommoditySchedule)
+    BotContext.get().database.set_items_commodity(list(found), commodity)
+    for target in targets:
+        if target.notification.item_id in found:
+            target.commodity = commodity
+
+
+def _save_schedule(auction_schedule: schedule.Schedule):
+    db = BotContext.get().database
+    if isinstance(auction_schedule, CommoditySchedule):
+        db.set_commodity_schedule(auction_schedule)
+    else:
+        db.set_realm_schedule(auction_schedule)
 
 
 def _check_min_qty(
-        context: CallbackContext,
         notification: Notification,
-        auction: Auction,
+        book: OrderBook,
         item_name: str,
-        telegram_id: int,
         realm_name: str
-) -> bool:
-    qty_under_min = 0
-    price_under_min = 0
-    for lot in auction.lots:
-        if lot.price <= notification.price:
-            qty_under_min += lot.qty
-            price_under_min += lot.price * lot.qty
-        else:
-            break
+) -> Optional[tuple[str, str]]:
+    qty_under_min, price_under_min = book.under_price(notification.price)
     if qty_under_min >= notification.value:
         avg_price = int(price_under_min / qty_under_min)
         price = sanitize_str(to_human_price(avg_price))
         item = wowhead_link(notification.item_id, item_name)
         realm_name_san = sanitize_str(realm_name)
         text = f"{item}: {qty_under_min} lots available on *{realm_name_san}* with average price of {price}"
-        context.bot.send_message(telegram_id, text, parse_mode=PARSEMODE_MARKDOWN_V2, disable_web_page_preview=True)
-        return True
-    return False
+        return text, _fingerprint(qty_under_min, avg_price)
+    return None
 
 
 def _check_market_price(
-        context: CallbackContext,
         notification: Notification,
-        auction: Auction,
+        book: OrderBook,
         item_name: str,
-        telegram_id: int,
         realm_name: str
-) -> bool:
-    min_price = None
-    for lot in auction.lots:
-        if lot.price <= notification.price:
-            if not min_price or lot.price < min_price:
-                min_price = lot.price
+) -> Optional[tuple[str, str]]:
+    min_price = book.min_price(notification.price)
     if min_price:
         price = sanitize_str(to_human_price(min_price))
         item = wowhead_link(notification.item_id, item_name)
         realm_name_san = sanitize_str(realm_name)
         text = f"{item} is available on *{realm_name_san}* with minimum price of {price}"
-        context.bot.send_message(telegram_id, text, parse_mode=PARSEMODE_MARKDOWN_V2, disable_web_page_preview=True)
-        return True
-    return False
+        return text, _fingerprint(1, min_price)
+    return None
 
 
 def _check_average(
-        context: CallbackContext,
         notification: Notification,
-        auction: Auction,
+        book: OrderBook,
         item_name: str,
-        telegram_id: int,
         realm_name: str
-) -> bool:
-    avg = 0
-    qty = 0
-    for lot in auction.lots:
-        new_avg = int(
-            (avg * qty + lot.price * lot.qty) / (qty + lot.qty)
-        )
-        if new_avg <= notification.price:
-            avg = new_avg
-            qty += lot.qty
-        else:
-            break
+) -> Optional[tuple[str, str]]:
+    qty, avg = book.under_average(notification.price)
     if qty >= notification.value:
         price = sanitize_str(to_human_price(avg))
         item = wowhead_link(notification.item_id, item_name)
         realm_name_san = sanitize_str(realm_name)
         text = f"{item}: {qty} lots available on *{realm_name_san}* with average price of {price}"
-        context.bot.send_message(telegram_id, text, parse_mode=PARSEMODE_MARKDOWN_V2, disable_web_page_preview=True)
-        return True
-    return False
+        return text, _fingerprint(qty, avg)
+    return None
 
 
-def _get_item_names(notifications: list[Notification]) -> dict[int, str]:
-    items_ids = [n.item_id for n in notifications]
-    result = {}
-    items = BotContext.get().database.get_items(items_ids)
-    for item in items:
-        result[item.item_id] = item.name
-    return result
+def _fingerprint(qty: int, price: int) -> str:
+    """
+    Returns quantity and price buckets of an alert: alerts with the same fingerprint are considered unchanged.
+    """
+    qty_bucket = int(math.log(max(qty, 1), QTY_BUCKET_BASE))
+    price_bucket = int(math.log(max(price, 1), PRICE_BUCKET_BASE))
+    return f"{qty_bucket}:{price_bucket}"
+
+
+def _parse_http_date(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(email.utils.parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError):
+        logger.warning(f"invalid Last-Modified value: {value}")
+        return None
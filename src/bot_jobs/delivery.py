@@ -0,0 +1,135 @@
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Optional
+
+from telegram import Bot
+from telegram.constants import PARSEMODE_MARKDOWN_V2
+from telegram.error import RetryAfter, Unauthorized, BadRequest, NetworkError
+from telegram.ext import Dispatcher
+
+import metrics
+import tracing
+from bot_context import BotContext
+from model.outbox_message import OutboxMessage
+from rate_limiter import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+DELIVERY_WORKERS = 4
+MAX_ATTEMPTS = 10
+MAX_BACKOFF = 15 * 60
+IDLE_WAIT = 5
+
+_wakeup = threading.Event()
+
+_SEND_SECONDS = metrics.Histogram('telegram_send_seconds', 'Telegram sendMessage latency')
+_SEND_FAILURES = metrics.Counter('telegram_send_failures_total', 'Failed Telegram sendMessage calls', ('reason',))
+_DELIVERY_LAG = metrics.Histogram(
+    'wow_alert_delivery_lag_seconds',
+    'Time from auction data last modification to delivery of the alert',
+    buckets=metrics.LAG_BUCKETS
+)
+
+
+def register(dispatcher: Dispatcher):
+    threading.Thread(name='delivery', target=_deliver_loop, args=[dispatcher.bot], daemon=True).start()
+
+
+def enqueue(chat_id: int, text: str, snapshot_at: Optional[int] = None):
+    """
+    Stores the message in the outbox, it will be sent by the delivery thread. `snapshot_at` is the last modified
+    timestamp of the auction data, which triggered the message.
+    """
+    BotContext.get().database.add_outbox_message(chat_id, text, int(time.time()), snapshot_at)
+    _wakeup.set()
+
+
+def _deliver_loop(bot: Bot):
+    bot_env = BotContext.get().bot_env
+    db = BotContext.get().database
+    global_limit = TokenBucket(bot_env.delivery_rate, bot_env.delivery_rate)
+    chat_interval = 1 / bot_env.delivery_chat_rate
+    # chat_id -> time of the next allowed message
+    chat_next_send: dict[int, float] = {}
+    in_flight: set[int] = set()
+    lock = threading.Lock()
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=DELIVERY_WORKERS, thread_name_prefix='delivery')
+
+    def on_sent(message_id: int):
+        with lock:
+            in_flight.discard(message_id)
+
+    while True:
+        _wakeup.clear()
+        try:
+            messages = db.get_outbox_messages(int(time.time()), BATCH_SIZE)
+        except Exception as e:
+            logger.error(f"failed to read outbox: {e}", exc_info=e)
+            messages = []
+        scheduled = 0
+        batch = None
+        now = time.monotonic()
+        for chat_id in [c for c, t in chat_next_send.items() if t <= now]:
+            del chat_next_send[chat_id]
+        # the outbox returns only the oldest pending message of a chat, the next one follows after it is sent
+        for message in messages:
+            with lock:
+                if message.message_id in in_flight:
+                    continue
+            if chat_next_send.get(message.chat_id, 0) > time.monotonic():
+                continue
+            global_limit.acquire()
+            chat_next_send[message.chat_id] = time.monotonic() + chat_interval
+            with lock:
+                in_flight.add(message.message_id)
+            if batch is None:
+                batch = tracing.start_trace('delivery')
+            send = tracing.wrap(batch, 'send', _send, chat_id=message.chat_id)
+            future = executor.submit(send, bot, message, global_limit)
+            future.add_done_callback(lambda _, message_id=message.message_id: on_sent(message_id))
+            scheduled += 1
+        if batch:
+            batch.end(messages=scheduled)
+        if scheduled == 0:
+            _wakeup.wait(IDLE_WAIT if len(messages) == 0 else chat_interval)
+
+
+def _send(bot: Bot, message: OutboxMessage, global_limit: TokenBucket):
+    db = BotContext.get().database
+    start = time.perf_counter()
+    try:
+        bot.send_message(
+            message.chat_id,
+            message.text,
+            parse_mode=PARSEMODE_MARKDOWN_V2,
+            disable_web_page_preview=True
+        )
+        _SEND_SECONDS.observe(time.perf_counter() - start)
+        if message.snapshot_at:
+            _DELIVERY_LAG.observe(time.time() - message.snapshot_at)
+        db.delete_outbox_message(message.message_id)
+    except RetryAfter as e:
+        _SEND_FAILURES.inc('retry_after')
+        logger.warning(f"flood limit exceeded, retry after {e.retry_after}s")
+        global_limit.pause(e.retry_after)
+        db.postpone_outbox_message(message.message_id, int(time.time() + e.retry_after))
+    except (Unauthorized, BadRequest) as e:
+        _SEND_FAILURES.inc('rejected')
+        logger.warning(f"dropping message id={message.message_id} to chat_id={message.chat_id}: {e}")
+        db.delete_outbox_message(message.message_id)
+    except NetworkError as e:
+        _SEND_FAILURES.inc('network')
+        if message.attempts + 1 >= MAX_ATTEMPTS:
+            logger.error(f"dropping message id={message.message_id} after {MAX_ATTEMPTS} attempts: {e}")
+            db.delete_outbox_message(message.message_id)
+        else:
+            backoff = min(2 ** message.attempts, MAX_BACKOFF)
+            logger.warning(f"failed to send message id={message.message_id}, retry in {backoff}s: {e}")
+            db.postpone_outbox_message(message.message_id, int(time.time() + backoff))
+    except Exception as e:
+        _SEND_FAILURES.inc('error')
+        logger.error(f"failed to send message id={message.message_id}: {e}", exc_info=e)
+        db.postpone_outbox_message(message.message_id, int(time.time() + MAX_BACKOFF))
@@ -0,0 +1,91 @@
+import asyncio
+import concurrent.futures
+import logging
+import threading
+from typing import Callable, TypeVar, Any
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class FetchEngine:
+    """
+    Runs fetch tasks concurrently on an asyncio event loop in a dedicated thread.
+
+    Blocking downloads are offloaded to a thread pool, their concurrency is limited globally and per host.
+    Fetched data is passed to a bounded evaluation stage: when evaluation falls behind, new downloads wait for
+    free slots in the evaluation queue instead of piling up fetched data in memory.
+    """
+
+    def __init__(self, max_concurrency: int, max_host_concurrency: int, evaluation_queue_size: int,
+                 evaluation_workers: int):
+        # every download holds an evaluation slot, so no more downloads than slots can run at once
+        evaluation_slots = evaluation_queue_size + evaluation_workers
+        if max_concurrency > evaluation_slots:
+            logger.info(f"fetch concurrency {max_concurrency} is limited to {evaluation_slots} evaluation slots")
+            max_concurrency = evaluation_slots
+        self._max_concurrency = max_concurrency
+        self._max_host_concurrency = max_host_concurrency
+        self._fetch_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix='fetch')
+        self._evaluate_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=evaluation_workers, thread_name_prefix='evaluate')
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._global_semaphore = None
+        self._evaluation_slots = None
+        self._host_semaphores: dict[str, asyncio.Semaphore] = {}
+        self._queue = None
+        self._evaluation_workers = evaluation_workers
+        self._evaluation_queue_size = evaluation_queue_size
+        threading.Thread(name='fetch-engine', target=self._run_loop, daemon=True).start()
+        self._ready.wait()
+
+    def submit(
+            self,
+            host: str,
+            fetch: Callable[[], T],
+            evaluate: Callable[[T], Any]
+    ) -> concurrent.futures.Future:
+        """
+        Schedules `fetch` and then `evaluate` with its result. Can be called from any thread.
+        """
+        return asyncio.run_coroutine_threadsafe(self._process(host, fetch, evaluate), self._loop)
+
+    def queue_size(self) -> int:
+        """
+        Returns the number of fetched results waiting for evaluation.
+        """
+        return self._queue.qsize()
+
+    def _run_loop(self):
+        asyncio.set_event_loop(self._loop)
+        self._global_semaphore = asyncio.Semaphore(self._max_concurrency)
+        # a slot is taken before the download starts and released after evaluation, so fetched data held in memory
+        # is bounded by the queued and the evaluating results
+        self._evaluation_slots = asyncio.Semaphore(self._evaluation_queue_size + self._evaluation_workers)
+        self._queue = asyncio.Queue(maxsize=self._evaluation_queue_size)
+        for _ in range(self._evaluation_workers):
+            self._loop.create_task(self._evaluation_worker())
+        self._loop.call_soon(self._ready.set)
+        self._loop.run_forever()
+
+    async def _process(self, host: str, fetch: Callable[[], T], evaluate: Callable[[T], Any]):
+        host_semaphore = self._host_semaphores.setdefault(host, asyncio.Semaphore(self._max_host_concurrency))
+        async with self._evaluation_slots:
+            async with self._global_semaphore, host_semaphore:
+                result = await self._loop.run_in_executor(self._fetch_executor, fetch)
+            done = self._loop.create_future()
+            await self._queue.put((evaluate, result, done))
+            return await done
+
+    async def _evaluation_worker(self):
+        while True:
+            evaluate, result, done = await self._queue.get()
+            try:
+                done.set_result(await self._loop.run_in_executor(self._evaluate_executor, evaluate, result))
+            except Exception as e:
+                done.set_exception(e)
+            finally:
+                self._queue.task_done()
@@ -0,0 +1,61 @@
+import logging
+import time
+
+from telegram.ext import Dispatcher, CallbackContext
+
+from bot_context import BotContext
+from model.auction import Auction
+from model.order_book import OrderBook
+from model.price_stats import PriceStats
+
+logger = logging.getLogger(__name__)
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+MAINTENANCE_INTERVAL = HOUR
+
+
+def register(dispatcher: Dispatcher):
+    dispatcher.job_queue.run_repeating(_callback, first=60, interval=MAINTENANCE_INTERVAL)
+
+
+def record(
+        region: str,
+        connected_realm_id: int,
+        auctions: dict[int, Auction],
+        books: dict[int, OrderBook],
+        timestamp: int
+):
+    """
+    Stores hourly price stats of the evaluated auction data, `connected_realm_id` is 0 for commodities. Stats are
+    computed from the order books built for evaluation, so they need no extra pass over the auction data.
+    """
+    hour = timestamp - timestamp % HOUR
+    stats = []
+    for item_id, book in books.items():
+        min_price = book.quantile(0)
+        if min_price is None:
+            continue
+        stats.append(PriceStats(
+            region,
+            connected_realm_id,
+            item_id,
+            HOUR,
+            hour,
+            min_price,
+            book.quantile(0.1),
+            book.quantile(0.5),
+            book.cum_qty[-1],
+            auctions[item_id].listings
+        ))
+    BotContext.get().database.add_price_stats(stats)
+
+
+def _callback(context: CallbackContext):
+    bot_env = BotContext.get().bot_env
+    db = BotContext.get().database
+    now = int(time.time())
+    # only whole days are downsampled
+    hourly_before = now - bot_env.history_hourly_retention * DAY
+    db.downsample_price_history(HOUR, DAY, hourly_before - hourly_before % DAY)
+    db.delete_price_history(DAY, now - bot_env.history_retention * DAY)
@@ -0,0 +1,30 @@
+import logging
+
+from telegram.ext import Dispatcher, CallbackContext
+
+from bot_context import BotContext
+from wow.wow_game_api import REGIONS
+
+logger = logging.getLogger(__name__)
+
+LOAD_INTERVAL = 24 * 60 * 60
+
+
+def register(dispatcher: Dispatcher):
+    dispatcher.job_queue.run_repeating(_callback, first=10, interval=LOAD_INTERVAL)
+
+
+def _callback(context: CallbackContext):
+    """
+    Loads names of all realms of each region into the realm catalog, so realm entry needs no API requests.
+    """
+    api = BotContext.get().wow_game_api
+    catalog = BotContext.get().realm_catalog
+    for region in REGIONS:
+        try:
+            realms = api.with_retry(lambda: api.realms(region))
+        except Exception as e:
+            logger.error(f"failed to load realms of {region}: {e}", exc_info=e)
+            continue
+        if realms:
+            catalog.update(region, realms)
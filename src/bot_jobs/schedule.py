@@ -0,0 +1,64 @@
+import logging
+from typing import Union
+
+from model.commodity_schedule import CommoditySchedule
+from model.realm_schedule import RealmSchedule
+
+# delay between the expected publish time and the fetch
+PUBLISH_DELAY = 60
+# bounds for the estimated publish interval
+MIN_INTERVAL = 10 * 60
+MAX_INTERVAL = 3 * 60 * 60
+# weight of the newly observed interval in the estimate
+INTERVAL_WEIGHT = 0.3
+# bounds for the retry delay when expected auction data is not published yet
+MIN_BACKOFF = 60
+MAX_BACKOFF = 15 * 60
+
+logger = logging.getLogger(__name__)
+
+Schedule = Union[RealmSchedule, CommoditySchedule]
+
+
+def new_schedule(connected_realm_id: int, interval: int) -> RealmSchedule:
+    return RealmSchedule(connected_realm_id, _clamp_interval(interval), None, 0, 0)
+
+
+def new_commodity_schedule(region: str, interval: int) -> CommoditySchedule:
+    return CommoditySchedule(region, _clamp_interval(interval), None, 0, 0)
+
+
+def is_due(schedule: Schedule, now: int) -> bool:
+    return schedule.next_check <= now
+
+
+def on_updated(schedule: Schedule, last_modified: int, now: int):
+    """
+    Updates the publish interval estimate with the newly observed auction data and plans the fetch right after
+    the next expected publish.
+    """
+    if schedule.last_modified:
+        observed = last_modified - schedule.last_modified
+        # larger gaps are most likely caused by missed publishes or maintenance
+        if MIN_INTERVAL <= observed <= 2 * schedule.interval:
+            interval = schedule.interval * (1 - INTERVAL_WEIGHT) + observed * INTERVAL_WEIGHT
+            schedule.interval = _clamp_interval(int(interval))
+    schedule.last_modified = last_modified
+    schedule.misses = 0
+    next_check = last_modified + schedule.interval + PUBLISH_DELAY
+    schedule.next_check = next_check if next_check > now else now + MIN_BACKOFF
+    logger.debug(f"{schedule}: interval={schedule.interval}, next_check={schedule.next_check}")
+
+
+def on_unchanged(schedule: Schedule, now: int):
+    """
+    Retries with exponential backoff until the expected auction data is published.
+    """
+    schedule.misses += 1
+    backoff = min(MIN_BACKOFF * 2 ** min(schedule.misses - 1, 10), MAX_BACKOFF)
+    schedule.next_check = now + backoff
+    logger.debug(f"{schedule}: misses={schedule.misses}, next_check={schedule.next_check}")
+
+
+def _clamp_interval(interval: int) -> int:
+    return max(MIN_INTERVAL, min(interval, MAX_INTERVAL))
@@ -1,65 +1,81 @@
+import itertools
 import logging
 import sqlite3
-from typing import Optional
+import threading
+from typing import Optional, Iterator
 
+from db.migrations import MIGRATIONS
+from model.alert_state import AlertState
+from model.commodity_schedule import CommoditySchedule
 from model.connected_realm import ConnectedRealm
 from model.item import Item
 from model.notification import Notification
+from model.notification_target import NotificationTarget
+from model.outbox_message import OutboxMessage
+from model.price_stats import PriceStats
+from model.realm import Realm
+from model.realm_schedule import RealmSchedule
 from model.user import User
 
 logger = logging.getLogger(__name__)
 
+CACHE_SIZE = -16 * 1024  # KiB
+MMAP_SIZE = 64 * 1024 * 1024
+BUSY_TIMEOUT = 5000  # ms
+MAX_VARIABLES = 500  # max number of bound parameters in a single IN (...) query
+
 
 class Database:
 
     def __init__(self, database: str):
         self._database = database
-        self._con = None
-
-    def create_tables(self):
-        with self._get_connection() as con:
-            con.execute(
-                'CREATE TABLE IF NOT EXISTS users ('
-                'id INTEGER PRIMARY KEY,'
-                'telegram_id INTEGER NOT NULL,'
-                'level INTEGER DEFAULT 0'  # 0 - user, 1 - admin 
-                ')'
-            )
-            con.execute(
-                'CREATE TABLE IF NOT EXISTS items ('
-                'id INTEGER PRIMARY KEY,'
-                'name TEXT NOT NULL'
-                ')'
-            )
-            con.execute(
-                'CREATE TABLE IF NOT EXISTS connected_realms ('
-                'id INTEGER PRIMARY KEY,'
-                'region TEXT NOT NULL,'
-                'slug TEXT NOT NULL,'
-                'name TEXT NOT NULL'
-                ')'
-            )
-            con.execute(
-                'CREATE TABLE IF NOT EXISTS notifications ('
-                'id INTEGER PRIMARY KEY,'
-                'user_id INTEGER NOT NULL,'
-                'connected_realm_id INTEGER NOT NULL,'
-                'item_id INTEGER NOT NULL,'
-                'kind TEXT NOT NULL,'
-                'price INTEGER NOT NULL,'
-                'value INTEGER DEFAULT 1,'
-                'FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,'
-                'FOREIGN KEY(connected_realm_id) REFERENCES connected_realms(id) ON DELETE NO ACTION,'
-                'FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE NO ACTION'
-                ')'
-            )
+        self._local = threading.local()
+        self._connections: list[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def migrate(self):
+        """
+        Applies pending schema migrations.
+        """
+        con = self._get_connection()
+        with con:
+            con.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)')
+            row = con.execute('SELECT version FROM schema_version').fetchone()
+            version = row[0] if row else 0
+        for version, statements in enumerate(MIGRATIONS[version:], start=version + 1):
+            with con:
+                con.execute('BEGIN')
+                for sql in statements:
+                    con.execute(sql)
+                con.execute('DELETE FROM schema_version')
+                con.execute('INSERT INTO schema_version VALUES (?)', [version])
+            logger.info(f"migrated database to version {version}")
 
     def add_connected_realm(self, connected_realm_id: int, region: str, slug: str, name: str):
         with self._get_connection() as con:
             sql = 'INSERT INTO connected_realms VALUES(?, ?, ?, ?)'
             con.execute(sql, (connected_realm_id, region, slug, name))
+            sql = 'INSERT OR REPLACE INTO realm_names VALUES(?, ?, ?, ?)'
+            con.execute(sql, (region, slug, name, connected_realm_id))
             logger.info(f"added connected realm id={connected_realm_id}: {region}-{name}'")
 
+    def set_realms(self, region: str, realms: list[Realm]):
+        """
+        Stores names of realms and adds their connected realms, which are not known yet. A new connected realm is
+        named after its first realm.
+        """
+        with self._get_connection() as con:
+            sql = 'INSERT OR IGNORE INTO connected_realms VALUES(?, ?, ?, ?)'
+            con.executemany(sql, [(r.connected_realm_id, region, r.slug, r.name) for r in realms])
+            sql = 'INSERT OR REPLACE INTO realm_names VALUES(?, ?, ?, ?)'
+            con.executemany(sql, [(region, r.slug, r.name, r.connected_realm_id) for r in realms])
+            logger.info(f"stored {len(realms)} realms of {region}")
+
+    def get_realms(self, region: str) -> list[Realm]:
+        with self._get_connection() as con:
+            sql = 'SELECT region, slug, name, connected_realm_id FROM realm_names WHERE region = ?'
+            return [Realm(*row) for row in con.execute(sql, [region])]
+
     def get_connected_realm(self, region: str, slug: str) -> Optional[ConnectedRealm]:
         with self._get_connection() as con:
             sql = 'SELECT * FROM connected_realms WHERE region = ? AND slug = ?'
@@ -98,19 +114,20 @@ class Database:
                 result.append(ConnectedRealm(*row))
         return result
 
-    def add_item(self, item_id: int, name: str):
+    def add_item(self, item_id: int, name: str, commodity: Optional[bool] = None):
         with self._get_connection() as con:
-            sql = 'INSERT INTO items VALUES(?, ?)'
-            con.execute(sql, (item_id, name))
+            sql = 'INSERT INTO items VALUES(?, ?, ?)'
+            con.execute(sql, (item_id, name, commodity))
             logger.info(f"added item id={item_id}, name='{name}'")
+        self.add_catalog_items([Item(item_id, name, commodity)])
 
     def get_item(self, item_id: int) -> Optional[Item]:
         with self._get_connection() as con:
-            sql = 'SELECT name FROM items WHERE id = ?'
+            sql = 'SELECT name, commodity FROM items WHERE id = ?'
             cur = con.execute(sql, [item_id])
             row = cur.fetchone()
             if row:
-                return Item(item_id, row[0])
+                return Item(item_id, *row)
         logger.info(f"item id={item_id} not found")
         return None
 
@@ -123,6 +140,96 @@ class Database:
                 result.append(Item(*row))
         return result
 
+    def set_items_commodity(self, item_ids: list[int], commodity: bool):
+        with self._get_connection() as con:
+            sql = 'UPDATE items SET commodity = ? WHERE id in (%s)' % (','.join('?' * len(item_ids)))
+            con.execute(sql, [commodity, *item_ids])
+            sql = 'UPDATE item_catalog SET commodity = ? WHERE id in (%s)' % (','.join('?' * len(item_ids)))
+            con.execute(sql, [commodity, *item_ids])
+            logger.info(f"updated commodity={commodity} for items ids={item_ids}")
+
+    def get_cached_item(self, region: str, item_id: int, fetched_after: int) -> Optional[Item]:
+        with self._get_connection() as con:
+            sql = 'SELECT name, commodity FROM item_cache WHERE region = ? AND id = ? AND fetched_at > ?'
+            row = con.execute(sql, (region, item_id, fetched_after)).fetchone()
+            if row:
+                return Item(item_id, *row)
+        return None
+
+    def set_cached_items(self, region: str, items: list[Item], fetched_at: int):
+        with self._get_connection() as con:
+            sql = 'INSERT OR REPLACE INTO item_cache VALUES (?, ?, ?, ?, ?)'
+            con.executemany(sql, [(region, item.item_id, item.name, item.commodity, fetched_at) for item in items])
+
+    def get_cached_item_search(self, region: str, query: str, max_results: int, fetched_after: int) -> list[Item]:
+        """
+        Returns cached search results in their original order, or an empty list, if any of them is not cached.
+        """
+        with self._get_connection() as con:
+            sql = ('SELECT item_ids FROM item_search_cache '
+                   'WHERE region = ? AND query = ? AND max_results = ? AND fetched_at > ?')
+            row = con.execute(sql, (region, query, max_results, fetched_after)).fetchone()
+            if not row:
+                return []
+            item_ids = [int(item_id) for item_id in row[0].split(',')]
+            sql = 'SELECT id, name, commodity FROM item_cache WHERE region = ? AND id in (%s)' % (
+                ','.join('?' * len(item_ids)))
+            items = {item.item_id: item for item in (Item(*r) for r in con.execute(sql, [region, *item_ids]))}
+        if len(items) != len(item_ids):
+            return []
+        return [items[item_id] for item_id in item_ids]
+
+    def set_cached_item_search(self, region: str, query: str, max_results: int, items: list[Item], fetched_at: int):
+        self.set_cached_items(region, items, fetched_at)
+        with self._get_connection() as con:
+            sql = 'INSERT OR REPLACE INTO item_search_cache VALUES (?, ?, ?, ?, ?)'
+            item_ids = ','.join(str(item.item_id) for item in items)
+            con.execute(sql, (region, query, max_results, item_ids, fetched_at))
+
+    def delete_expired_item_cache(self, fetched_before: int):
+        with self._get_connection() as con:
+            con.execute('DELETE FROM item_search_cache WHERE fetched_at <= ?', [fetched_before])
+            cur = con.execute('DELETE FROM item_cache WHERE fetched_at <= ?', [fetched_before])
+            logger.info(f"deleted {cur.rowcount} expired cached items")
+
+    def add_catalog_items(self, items: list[Item]):
+        """
+        Adds items to the item catalog or renames existing ones, a known commodity flag is never reset to unknown.
+        """
+        with self._get_connection() as con:
+            sql = ('INSERT INTO item_catalog VALUES (?, ?, ?) '
+                   'ON CONFLICT(id) DO UPDATE SET name = excluded.name, '
+                   'commodity = coalesce(excluded.commodity, commodity) '
+                   'WHERE name != excluded.name OR commodity IS NOT coalesce(excluded.commodity, commodity)')
+            con.executemany(sql, [(item.item_id, item.name, item.commodity) for item in items])
+
+    def get_catalog_item(self, item_id: int) -> Optional[Item]:
+        with self._get_connection() as con:
+            sql = 'SELECT name, commodity FROM item_catalog WHERE id = ?'
+            row = con.execute(sql, [item_id]).fetchone()
+            if row:
+                return Item(item_id, *row)
+        return None
+
+    def search_item_catalog(self, match: str, name: str, limit: int) -> list[Item]:
+        """
+        Returns catalog items matching the FTS5 query `match`. An item named `name` comes first, then items with names
+        starting with `name`, then the rest by relevance and shorter names first.
+        """
+        with self._get_connection() as con:
+            sql = ('SELECT c.id, c.name, c.commodity FROM item_catalog_fts f '
+                   'JOIN item_catalog c ON c.id = f.rowid '
+                   'WHERE item_catalog_fts MATCH ? '
+                   'ORDER BY c.name = ? COLLATE NOCASE DESC, substr(c.name, 1, ?) = ? COLLATE NOCASE DESC, '
+                   'f.rank, length(c.name) '
+                   'LIMIT ?')
+            cur = con.execute(sql, (match, name, len(name), name, limit))
+            return [Item(*row) for row in cur]
+
+    def count_catalog_items(self) -> int:
+        with self._get_connection() as con:
+            return con.execute('SELECT count(*) FROM item_catalog').fetchone()[0]
+
     def add_user(self, telegram_id: int):
         with self._get_connection() as con:
             sql = 'INSERT INTO users(telegram_id) VALUES (?)'
@@ -178,6 +285,27 @@ class Database:
                 result.append(Notification(*row))
         return result
 
+    def get_notification_targets(self) -> Iterator[tuple[ConnectedRealm, list[NotificationTarget]]]:
+        """
+        Streams all notifications with their recipients and item names, grouped by connected realm.
+        """
+        with self._get_connection() as con:
+            sql = ('SELECT n.*, u.telegram_id, i.name, i.commodity, cr.region, cr.slug, cr.name '
+                   'FROM notifications n '
+                   'INNER JOIN users u ON n.user_id = u.id '
+                   'INNER JOIN items i ON n.item_id = i.id '
+                   'INNER JOIN connected_realms cr ON n.connected_realm_id = cr.id '
+                   'ORDER BY n.connected_realm_id')
+            cur = con.execute(sql)
+            for connected_realm_id, rows in itertools.groupby(cur, key=lambda r: r[2]):
+                targets = []
+                realm = None
+                for row in rows:
+                    if not realm:
+                        realm = ConnectedRealm(connected_realm_id, *row[10:13])
+                    targets.append(NotificationTarget(Notification(*row[:7]), realm, *row[7:10]))
+                yield realm, targets
+
     def get_notifications_count(self, user_id) -> int:
         with self._get_connection() as con:
             sql = 'SELECT COUNT(*) FROM notifications WHERE user_id = ?'
@@ -222,14 +350,177 @@ class Database:
             sql = 'DELETE FROM notifications WHERE user_id = ? AND id = ?'
             cur = con.execute(sql, (user_id, notification_id))
             if cur.rowcount > 0:
+                con.execute('DELETE FROM alert_states WHERE notification_id = ?', [notification_id])
                 logger.info(f"deleted notification id={notification_id}")
                 return True
         return False
 
+    def get_realm_schedules(self) -> list[RealmSchedule]:
+        result = []
+        with self._get_connection() as con:
+            sql = 'SELECT * FROM realm_schedules'
+            for row in con.execute(sql):
+                result.append(RealmSchedule(*row))
+        return result
+
+    def set_realm_schedule(self, schedule: RealmSchedule):
+        with self._get_connection() as con:
+            sql = 'INSERT OR REPLACE INTO realm_schedules VALUES (?, ?, ?, ?, ?)'
+            con.execute(sql, (
+                schedule.connected_realm_id,
+                schedule.interval,
+                schedule.last_modified,
+                schedule.next_check,
+                schedule.misses
+            ))
+
+    def get_commodity_schedules(self) -> list[CommoditySchedule]:
+        result = []
+        with self._get_connection() as con:
+            sql = 'SELECT * FROM commodity_schedules'
+            for row in con.execute(sql):
+                result.append(CommoditySchedule(*row))
+        return result
+
+    def set_commodity_schedule(self, schedule: CommoditySchedule):
+        with self._get_connection() as con:
+            sql = 'INSERT OR REPLACE INTO commodity_schedules VALUES (?, ?, ?, ?, ?)'
+            con.execute(sql, (
+                schedule.region,
+                schedule.interval,
+                schedule.last_modified,
+                schedule.next_check,
+                schedule.misses
+            ))
+
+    def get_alert_states(self, notification_ids: list[int]) -> dict[int, AlertState]:
+        result = {}
+        with self._get_connection() as con:
+            for chunk in _chunks(notification_ids):
+                sql = 'SELECT * FROM alert_states WHERE notification_id in (%s)' % (','.join('?' * len(chunk)))
+                for row in con.execute(sql, chunk):
+                    state = AlertState(*row)
+                    result[state.notification_id] = state
+        return result
+
+    def set_alert_states(self, states: list[AlertState]):
+        with self._get_connection() as con:
+            sql = 'INSERT OR REPLACE INTO alert_states VALUES (?, ?, ?)'
+            con.executemany(sql, [(s.notification_id, s.fingerprint, s.fired_at) for s in states])
+
+    def delete_alert_states(self, notification_ids: list[int]):
+        with self._get_connection() as con:
+            for chunk in _chunks(notification_ids):
+                sql = 'DELETE FROM alert_states WHERE notification_id in (%s)' % (','.join('?' * len(chunk)))
+                con.execute(sql, chunk)
+
+    def add_price_stats(self, stats: list[PriceStats]):
+        with self._get_connection() as con:
+            sql = 'INSERT OR REPLACE INTO price_history VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+            con.executemany(sql, [(
+                s.region,
+                s.connected_realm_id,
+                s.item_id,
+                s.resolution,
+                s.timestamp,
+                s.min_price,
+                s.p10_price,
+                s.median_price,
+                s.quantity,
+                s.listings
+            ) for s in stats])
+
+    def get_price_history(self, region: str, connected_realm_id: int, item_id: int, since: int) -> list[PriceStats]:
+        result = []
+        with self._get_connection() as con:
+            sql = ('SELECT * FROM price_history '
+                   'WHERE region = ? AND connected_realm_id = ? AND item_id = ? AND timestamp >= ? '
+                   'ORDER BY timestamp, resolution')
+            for row in con.execute(sql, (region, connected_realm_id, item_id, since)):
+                result.append(PriceStats(*row))
+        return result
+
+    def downsample_price_history(self, resolution: int, downsampled_resolution: int, before: int):
+        """
+        Merges records with `resolution` older than `before` into records with `downsampled_resolution`: minimum price
+        is the minimum of the merged records, other values are averages.
+        """
+        with self._get_connection() as con:
+            sql = ('INSERT OR REPLACE INTO price_history '
+                   'SELECT region, connected_realm_id, item_id, ?, timestamp - timestamp % ?, MIN(min_price), '
+                   'CAST(AVG(p10_price) AS INTEGER), CAST(AVG(median_price) AS INTEGER), '
+                   'CAST(AVG(quantity) AS INTEGER), CAST(AVG(listings) AS INTEGER) '
+                   'FROM price_history WHERE resolution = ? AND timestamp < ? '
+                   'GROUP BY region, connected_realm_id, item_id, timestamp - timestamp % ?')
+            con.execute(sql, (downsampled_resolution, downsampled_resolution, resolution, before,
+                              downsampled_resolution))
+            sql = 'DELETE FROM price_history WHERE resolution = ? AND timestamp < ?'
+            cur = con.execute(sql, (resolution, before))
+            logger.info(f"downsampled {cur.rowcount} price history records")
+
+    def delete_price_history(self, resolution: int, before: int):
+        with self._get_connection() as con:
+            sql = 'DELETE FROM price_history WHERE resolution = ? AND timestamp < ?'
+            cur = con.execute(sql, (resolution, before))
+            logger.info(f"deleted {cur.rowcount} expired price history records")
+
+    def add_outbox_message(self, chat_id: int, text: str, created_at: int, snapshot_at: Optional[int] = None):
+        with self._get_connection() as con:
+            sql = 'INSERT INTO outbox(chat_id, text, created_at, next_attempt_at, snapshot_at) VALUES (?, ?, ?, ?, ?)'
+            cur = con.execute(sql, (chat_id, text, created_at, created_at, snapshot_at))
+            logger.debug(f"added outbox message id={cur.lastrowid}")
+
+    def get_outbox_messages(self, now: int, limit: int) -> list[OutboxMessage]:
+        """
+        Returns messages due at `now`, which are the oldest pending messages of their chats. Newer messages of a chat
+        wait while an older one is postponed, so messages of a chat are sent in order.
+        """
+        result = []
+        with self._get_connection() as con:
+            sql = ('SELECT * FROM outbox o WHERE next_attempt_at <= ? '
+                   'AND id = (SELECT MIN(id) FROM outbox WHERE chat_id = o.chat_id) '
+                   'ORDER BY id LIMIT ?')
+            for row in con.execute(sql, (now, limit)):
+                result.append(OutboxMessage(*row))
+        return result
+
+    def postpone_outbox_message(self, message_id: int, next_attempt_at: int):
+        with self._get_connection() as con:
+            sql = 'UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?'
+            con.execute(sql, (next_attempt_at, message_id))
+
+    def delete_outbox_message(self, message_id: int):
+        with self._get_connection() as con:
+            sql = 'DELETE FROM outbox WHERE id = ?'
+            con.execute(sql, [message_id])
+
     def close(self):
-        if self._con:
-            self._con.close()
-            self._con = None
+        with self._lock:
+            for con in self._connections:
+                con.close()
+            self._connections.clear()
+            self._local = threading.local()
 
     def _get_connection(self) -> sqlite3.Connection:
-        return sqlite3.connect(self._database)
+        """
+        Returns a persistent connection of the current thread.
+        """
+        con = getattr(self._local, 'con', None)
+        if con:
+            return con
+        con = sqlite3.connect(self._database, check_same_thread=False)
+        con.execute('PRAGMA journal_mode = WAL')
+        con.execute('PRAGMA synchronous = NORMAL')
+        con.execute(f"PRAGMA cache_size = {CACHE_SIZE}")
+        con.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+        con.execute('PRAGMA temp_store = MEMORY')
+        con.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT}")
+        with self._lock:
+            self._connections.append(con)
+        self._local.con = con
+        return con
+
+
+def _chunks(values: list, size: int = MAX_VARIABLES) -> Iterator[list]:
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
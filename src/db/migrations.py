@@ -0,0 +1,164 @@
+"""
+Database schema migrations. Each migration is a list of SQL statements, the index of the migration in `MIGRATIONS`
+plus one is the schema version it migrates to. Migrations are append-only: never edit an applied migration, add a new
+one instead.
+"""
+
+MIGRATIONS: list[list[str]] = [
+    # 1: initial schema
+    [
+        'CREATE TABLE IF NOT EXISTS users ('
+        'id INTEGER PRIMARY KEY,'
+        'telegram_id INTEGER NOT NULL,'
+        'level INTEGER DEFAULT 0'  # 0 - user, 1 - admin
+        ')',
+        'CREATE TABLE IF NOT EXISTS items ('
+        'id INTEGER PRIMARY KEY,'
+        'name TEXT NOT NULL'
+        ')',
+        'CREATE TABLE IF NOT EXISTS connected_realms ('
+        'id INTEGER PRIMARY KEY,'
+        'region TEXT NOT NULL,'
+        'slug TEXT NOT NULL,'
+        'name TEXT NOT NULL'
+        ')',
+        'CREATE TABLE IF NOT EXISTS notifications ('
+        'id INTEGER PRIMARY KEY,'
+        'user_id INTEGER NOT NULL,'
+        'connected_realm_id INTEGER NOT NULL,'
+        'item_id INTEGER NOT NULL,'
+        'kind TEXT NOT NULL,'
+        'price INTEGER NOT NULL,'
+        'value INTEGER DEFAULT 1,'
+        'FOREIGN KEY(user_id) REFERENCES users(id) ON DELETE CASCADE,'
+        'FOREIGN KEY(connected_realm_id) REFERENCES connected_realms(id) ON DELETE NO ACTION,'
+        'FOREIGN KEY(item_id) REFERENCES items(id) ON DELETE NO ACTION'
+        ')',
+        'CREATE TABLE IF NOT EXISTS realm_schedules ('
+        'connected_realm_id INTEGER PRIMARY KEY,'
+        'interval INTEGER NOT NULL,'
+        'last_modified INTEGER,'
+        'next_check INTEGER NOT NULL,'
+        'misses INTEGER DEFAULT 0,'
+        'FOREIGN KEY(connected_realm_id) REFERENCES connected_realms(id) ON DELETE CASCADE'
+        ')',
+        'CREATE TABLE IF NOT EXISTS outbox ('
+        'id INTEGER PRIMARY KEY,'
+        'chat_id INTEGER NOT NULL,'
+        'text TEXT NOT NULL,'
+        'created_at INTEGER NOT NULL,'
+        'attempts INTEGER DEFAULT 0,'
+        'next_attempt_at INTEGER DEFAULT 0'
+        ')'
+    ],
+    # 2: indexes for frequent lookups
+    [
+        'CREATE INDEX IF NOT EXISTS users_telegram_id ON users(telegram_id)',
+        'CREATE INDEX IF NOT EXISTS connected_realms_region_slug ON connected_realms(region, slug)',
+        'CREATE INDEX IF NOT EXISTS notifications_user_id ON notifications(user_id)',
+        'CREATE INDEX IF NOT EXISTS notifications_connected_realm_id_item_id '
+        'ON notifications(connected_realm_id, item_id)',
+        'CREATE INDEX IF NOT EXISTS outbox_next_attempt_at ON outbox(next_attempt_at)'
+    ],
+    # 3: commodities
+    [
+        'ALTER TABLE items ADD COLUMN commodity INTEGER',
+        'CREATE TABLE IF NOT EXISTS commodity_schedules ('
+        'region TEXT PRIMARY KEY,'
+        'interval INTEGER NOT NULL,'
+        'last_modified INTEGER,'
+        'next_check INTEGER NOT NULL,'
+        'misses INTEGER DEFAULT 0'
+        ')'
+    ],
+    # 4: alert states
+    [
+        'CREATE TABLE IF NOT EXISTS alert_states ('
+        'notification_id INTEGER PRIMARY KEY,'
+        'fingerprint TEXT NOT NULL,'
+        'fired_at INTEGER NOT NULL,'
+        'FOREIGN KEY(notification_id) REFERENCES notifications(id) ON DELETE CASCADE'
+        ')'
+    ],
+    # 5: price history
+    [
+        'CREATE TABLE IF NOT EXISTS price_history ('
+        'region TEXT NOT NULL,'
+        'connected_realm_id INTEGER NOT NULL,'
+        'item_id INTEGER NOT NULL,'
+        'resolution INTEGER NOT NULL,'
+        'timestamp INTEGER NOT NULL,'
+        'min_price INTEGER NOT NULL,'
+        'p10_price INTEGER NOT NULL,'
+        'median_price INTEGER NOT NULL,'
+        'quantity INTEGER NOT NULL,'
+        'listings INTEGER NOT NULL,'
+        'PRIMARY KEY(region, connected_realm_id, item_id, resolution, timestamp)'
+        ') WITHOUT ROWID'
+    ],
+    # 6: last modified timestamp of auction data, which triggered an outbox message
+    [
+        'ALTER TABLE outbox ADD COLUMN snapshot_at INTEGER'
+    ],
+    # 7: item metadata cache
+    [
+        'CREATE TABLE IF NOT EXISTS item_cache ('
+        'region TEXT NOT NULL,'
+        'id INTEGER NOT NULL,'
+        'name TEXT NOT NULL,'
+        'commodity INTEGER,'
+        'fetched_at INTEGER NOT NULL,'
+        'PRIMARY KEY(region, id)'
+        ') WITHOUT ROWID',
+        'CREATE TABLE IF NOT EXISTS item_search_cache ('
+        'region TEXT NOT NULL,'
+        'query TEXT NOT NULL,'
+        'max_results INTEGER NOT NULL,'
+        'item_ids TEXT NOT NULL,'
+        'fetched_at INTEGER NOT NULL,'
+        'PRIMARY KEY(region, query, max_results)'
+        ') WITHOUT ROWID'
+    ],
+    # 8: local item catalog with full-text index of names
+    [
+        'CREATE TABLE IF NOT EXISTS item_catalog ('
+        'id INTEGER PRIMARY KEY,'
+        'name TEXT NOT NULL,'
+        'commodity INTEGER'
+        ')',
+        'CREATE VIRTUAL TABLE IF NOT EXISTS item_catalog_fts USING fts5('
+        'name,'
+        "content='item_catalog',"
+        "content_rowid='id',"
+        "tokenize='unicode61 remove_diacritics 2',"
+        "prefix='2 3'"
+        ')',
+        'CREATE TRIGGER IF NOT EXISTS item_catalog_ai AFTER INSERT ON item_catalog BEGIN '
+        'INSERT INTO item_catalog_fts(rowid, name) VALUES (new.id, new.name); '
+        'END',
+        'CREATE TRIGGER IF NOT EXISTS item_catalog_ad AFTER DELETE ON item_catalog BEGIN '
+        "INSERT INTO item_catalog_fts(item_catalog_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        'END',
+        'CREATE TRIGGER IF NOT EXISTS item_catalog_au AFTER UPDATE OF name ON item_catalog BEGIN '
+        "INSERT INTO item_catalog_fts(item_catalog_fts, rowid, name) VALUES ('delete', old.id, old.name); "
+        'INSERT INTO item_catalog_fts(rowid, name) VALUES (new.id, new.name); '
+        'END',
+        'INSERT OR IGNORE INTO item_catalog SELECT id, name, commodity FROM items',
+        'INSERT OR IGNORE INTO item_catalog SELECT id, name, commodity FROM item_cache'
+    ],
+    # 9: names of all realms of connected realms
+    [
+        'CREATE TABLE IF NOT EXISTS realm_names ('
+        'region TEXT NOT NULL,'
+        'slug TEXT NOT NULL,'
+        'name TEXT NOT NULL,'
+        'connected_realm_id INTEGER NOT NULL,'
+        'PRIMARY KEY(region, slug)'
+        ') WITHOUT ROWID',
+        'INSERT OR IGNORE INTO realm_names SELECT region, slug, name, id FROM connected_realms'
+    ],
+    # 10: oldest pending outbox message of a chat
+    [
+        'CREATE INDEX IF NOT EXISTS outbox_chat_id ON outbox(chat_id, id)'
+    ],
+]
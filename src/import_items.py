@@ -0,0 +1,45 @@
+"""
+Imports items of a dump file into the local item catalog, which is searched by the `/add` conversation before the
+Battle.net API.
+
+    $ python src/import_items.py items.csv [--database $DATABASE]
+
+See `wow.item_catalog.read_dump` for supported formats.
+"""
+import argparse
+import itertools
+import logging
+import os
+import time
+
+from db.database import Database
+from wow.item_catalog import ItemCatalog, read_dump
+
+BATCH_SIZE = 10_000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import items into the item catalog')
+    parser.add_argument('dump', help='CSV or JSON lines file of items')
+    parser.add_argument('--database', default=os.getenv('DATABASE'), help='path of SQLite database file')
+    args = parser.parse_args()
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    if not args.database:
+        parser.error('--database or DATABASE environment variable is required')
+
+    database = Database(args.database)
+    database.migrate()
+    catalog = ItemCatalog(database)
+    start = time.perf_counter()
+    count = 0
+    items = read_dump(args.dump)
+    while batch := list(itertools.islice(items, BATCH_SIZE)):
+        catalog.add(batch)
+        count += len(batch)
+    logging.info(f"imported {count} items in {time.perf_counter() - start:.1f}s, "
+                 f"catalog size is {database.count_catalog_items()}")
+    database.close()
+
+
+if __name__ == '__main__':
+    main()
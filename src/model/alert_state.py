@@ -0,0 +1,11 @@
+class AlertState:
+    __slots__ = ('notification_id', 'fingerprint', 'fired_at')
+
+    notification_id: int
+    fingerprint: str  # quantity and price buckets of the last sent alert
+    fired_at: int  # timestamp of the last sent alert
+
+    def __init__(self, notification_id: int, fingerprint: str, fired_at: int):
+        self.notification_id = notification_id
+        self.fingerprint = fingerprint
+        self.fired_at = fired_at
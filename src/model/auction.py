@@ -1,12 +1,63 @@
+from array import array
+from typing import Optional
+
+
 class Auction:
+    """
+    Lots of an item aggregated into price levels: lots with identical prices are merged at ingestion and levels are
+    stored in typed arrays sorted by price.
+
+    Lots of connected realm auction houses can only be bought whole, so with `whole_lots` quantities of individual
+    lots are kept as well. Commodities are bought by units, their lots are not kept.
+    """
+    __slots__ = ('item_id', 'prices', 'quantities', 'listings', 'lot_counts', 'lot_quantities', '_levels', '_lots')
+
     item_id: int
-    lots: list['Auction.Lot']
+    prices: array  # sorted unique prices
+    quantities: array  # total quantity for each price
+    listings: int  # number of ingested lots
+    lot_counts: Optional[array]  # number of lots of each price, with `whole_lots`
+    lot_quantities: Optional[array]  # quantities of lots sorted by price, in ingestion order within a price
 
-    def __init__(self, item_id: int):
+    def __init__(self, item_id: int, whole_lots: bool = False):
         self.item_id = item_id
-        self.lots = []
+        self.prices = array('q')
+        self.quantities = array('q')
+        self.listings = 0
+        self.lot_counts = array('q') if whole_lots else None
+        self.lot_quantities = array('q') if whole_lots else None
+        self._levels: Optional[dict[int, int]] = {}
+        self._lots: Optional[dict[int, list[int]]] = {} if whole_lots else None
+
+    def add(self, price: int, qty: int):
+        self._levels[price] = self._levels.get(price, 0) + qty
+        if self._lots is not None:
+            self._lots.setdefault(price, []).append(qty)
+        self.listings += 1
+
+    def finalize(self):
+        """
+        Sorts ingested price levels into arrays, must be called after the last `add`.
+        """
+        for price in sorted(self._levels):
+            self.prices.append(price)
+            self.quantities.append(self._levels[price])
+            if self._lots is not None:
+                self.lot_counts.append(len(self._lots[price]))
+                self.lot_quantities.extend(self._lots[price])
+        self._levels = None
+        self._lots = None
+
+    @property
+    def lots(self) -> list['Auction.Lot']:
+        """
+        Price levels as lots, sorted by price.
+        """
+        return [Auction.Lot(price, qty) for price, qty in zip(self.prices, self.quantities)]
 
     class Lot:
+        __slots__ = ('price', 'qty')
+
         price: int
         qty: int
 
@@ -0,0 +1,28 @@
+from typing import Optional
+
+
+class CommoditySchedule:
+    __slots__ = ('region', 'interval', 'last_modified', 'next_check', 'misses')
+
+    region: str
+    interval: int  # estimated auction data publish interval, seconds
+    last_modified: Optional[int]  # timestamp of the last evaluated auction data
+    next_check: int  # timestamp of the next fetch
+    misses: int  # number of consecutive fetches without new auction data
+
+    def __init__(
+            self,
+            region: str,
+            interval: int,
+            last_modified: Optional[int],
+            next_check: int,
+            misses: int
+    ):
+        self.region = region
+        self.interval = interval
+        self.last_modified = last_modified
+        self.next_check = next_check
+        self.misses = misses
+
+    def __str__(self):
+        return f"commodities region={self.region}"
@@ -1,4 +1,6 @@
 class ConnectedRealm:
+    __slots__ = ('connected_realm_id', 'region', 'slug', 'name')
+
     connected_realm_id: int
     region: str
     slug: str
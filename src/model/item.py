@@ -1,7 +1,14 @@
+from typing import Optional
+
+
 class Item:
+    __slots__ = ('item_id', 'name', 'commodity')
+
     item_id: int
     name: str
+    commodity: Optional[bool]  # listed on the region-wide commodities auction house, `None` if unknown
 
-    def __init__(self, item_id: int, name: str):
+    def __init__(self, item_id: int, name: str, commodity: Optional[bool] = None):
         self.item_id = item_id
         self.name = name
+        self.commodity = None if commodity is None else bool(commodity)
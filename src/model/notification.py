@@ -2,6 +2,8 @@ from enum import Enum
 
 
 class Notification:
+    __slots__ = ('n_id', 'user_id', 'connected_realm_id', 'item_id', 'kind', 'price', 'value')
+
     n_id: int
     user_id: int
     connected_realm_id: int
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from model.connected_realm import ConnectedRealm
+from model.notification import Notification
+
+
+class NotificationTarget:
+    __slots__ = ('notification', 'realm', 'telegram_id', 'item_name', 'commodity')
+
+    notification: Notification
+    realm: ConnectedRealm
+    telegram_id: int
+    item_name: str
+    commodity: Optional[bool]
+
+    def __init__(
+            self,
+            notification: Notification,
+            realm: ConnectedRealm,
+            telegram_id: int,
+            item_name: str,
+            commodity: Optional[bool]
+    ):
+        self.notification = notification
+        self.realm = realm
+        self.telegram_id = telegram_id
+        self.item_name = item_name
+        self.commodity = None if commodity is None else bool(commodity)
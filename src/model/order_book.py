@@ -0,0 +1,114 @@
+import math
+from bisect import bisect_left, bisect_right
+from typing import Optional
+
+from model.auction import Auction
+
+
+class OrderBook:
+    """
+    Price levels of an item with precomputed cumulative quantity, spend and running average price, so price queries
+    are answered by binary search instead of walking the levels.
+
+    If the auction keeps individual lots, average price queries take whole lots, with the same running average as
+    over the levels, but computed lot by lot.
+    """
+    __slots__ = ('prices', 'quantities', 'cum_qty', 'cum_spend', 'averages', 'lot_cum_qty', 'lot_averages')
+
+    prices: list[int]
+    quantities: list[int]
+    cum_qty: list[int]
+    cum_spend: list[int]
+    averages: list[int]
+    lot_cum_qty: Optional[list[int]]  # cumulative quantity after taking each lot, if lots are kept
+    lot_averages: Optional[list[int]]  # running average price after taking each lot, if lots are kept
+
+    def __init__(self, auction: Auction):
+        self.prices = auction.prices.tolist()
+        self.quantities = auction.quantities.tolist()
+        self.cum_qty = [0]
+        self.cum_spend = [0]
+        # running average price after taking each level, truncated the same way as when walking the levels one by
+        # one; it never decreases, since levels are sorted by price
+        self.averages = []
+        qty = 0
+        spend = 0
+        avg = 0
+        for price, level_qty in zip(self.prices, self.quantities):
+            avg = int((avg * qty + price * level_qty) / (qty + level_qty))
+            qty += level_qty
+            spend += price * level_qty
+            self.cum_qty.append(qty)
+            self.cum_spend.append(spend)
+            self.averages.append(avg)
+        self.lot_cum_qty = None
+        self.lot_averages = None
+        if auction.lot_quantities is not None:
+            self._add_lots(auction)
+
+    def under_price(self, price: int) -> tuple[int, int]:
+        """
+        Returns total quantity and spend of lots with price not greater than `price`.
+        """
+        count = bisect_right(self.prices, price)
+        return self.cum_qty[count], self.cum_spend[count]
+
+    def min_price(self, price: int) -> Optional[int]:
+        """
+        Returns minimum lot price, if it is not greater than `price`.
+        """
+        if self.prices and self.prices[0] <= price:
+            return self.prices[0]
+        return None
+
+    def under_average(self, price: int) -> tuple[int, int]:
+        """
+        Returns total quantity and average price of the cheapest lots with average price not greater than `price`.
+        Whole lots are taken, if they are kept. Otherwise whole price levels are taken first, then as many units of
+        the next level as the average allows.
+        """
+        if self.lot_averages is not None:
+            count = bisect_right(self.lot_averages, price)
+            if count == 0:
+                return 0, 0
+            return self.lot_cum_qty[count], self.lot_averages[count - 1]
+        count = bisect_right(self.averages, price)
+        qty = self.cum_qty[count]
+        avg = self.averages[count - 1] if count > 0 else 0
+        if count == len(self.prices) or qty == 0:
+            return qty, avg
+        # the next level is more expensive than `price`, find max number of its units `units`,
+        # such that (avg * qty + level_price * units) / (qty + units) < price + 1
+        level_price = self.prices[count]
+        budget = (price + 1 - avg) * qty
+        units = 0
+        if budget > 0:
+            units = min((budget - 1) // max(level_price - price - 1, 1), self.quantities[count] - 1)
+        if units > 0:
+            avg = int((avg * qty + level_price * units) / (qty + units))
+            qty += units
+        return qty, avg
+
+    def quantile(self, q: float) -> Optional[int]:
+        """
+        Returns price of the unit at quantile `q` of all units sorted by price, or `None`, if there are no lots.
+        """
+        total = self.cum_qty[-1]
+        if total == 0:
+            return None
+        target = max(1, math.ceil(total * q))
+        return self.prices[bisect_left(self.cum_qty, target) - 1]
+
+    def _add_lots(self, auction: Auction):
+        self.lot_cum_qty = [0]
+        self.lot_averages = []
+        qty = 0
+        avg = 0
+        lot = 0
+        for price, lot_count in zip(self.prices, auction.lot_counts):
+            for lot_qty in auction.lot_quantities[lot:lot + lot_count]:
+                avg = int((avg * qty + price * lot_qty) / (qty + lot_qty))
+                qty += lot_qty
+                self.lot_cum_qty.append(qty)
+                self.lot_averages.append(avg)
+            lot += lot_count
@@ -0,0 +1,31 @@
+from typing import Optional
+
+
+class OutboxMessage:
+    __slots__ = ('message_id', 'chat_id', 'text', 'created_at', 'attempts', 'next_attempt_at', 'snapshot_at')
+
+    message_id: int
+    chat_id: int
+    text: str
+    created_at: int
+    attempts: int
+    next_attempt_at: int
+    snapshot_at: Optional[int]  # last modified timestamp of auction data, which triggered the message
+
+    def __init__(
+            self,
+            message_id: int,
+            chat_id: int,
+            text: str,
+            created_at: int,
+            attempts: int,
+            next_attempt_at: int,
+            snapshot_at: Optional[int] = None
+    ):
+        self.message_id = message_id
+        self.chat_id = chat_id
+        self.text = text
+        self.created_at = created_at
+        self.attempts = attempts
+        self.next_attempt_at = next_attempt_at
+        self.snapshot_at = snapshot_at
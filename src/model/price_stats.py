@@ -0,0 +1,41 @@
+class PriceStats:
+    """
+    Aggregated auction data of an item at a point of time.
+    """
+    __slots__ = ('region', 'connected_realm_id', 'item_id', 'resolution', 'timestamp', 'min_price', 'p10_price',
+                 'median_price', 'quantity', 'listings')
+
+    region: str
+    connected_realm_id: int  # 0 for region-wide commodities
+    item_id: int
+    resolution: int  # seconds covered by the record
+    timestamp: int  # start of the covered period
+    min_price: int
+    p10_price: int
+    median_price: int
+    quantity: int
+    listings: int
+
+    def __init__(
+            self,
+            region: str,
+            connected_realm_id: int,
+            item_id: int,
+            resolution: int,
+            timestamp: int,
+            min_price: int,
+            p10_price: int,
+            median_price: int,
+            quantity: int,
+            listings: int
+    ):
+        self.region = region
+        self.connected_realm_id = connected_realm_id
+        self.item_id = item_id
+        self.resolution = resolution
+        self.timestamp = timestamp
+        self.min_price = min_price
+        self.p10_price = p10_price
+        self.median_price = median_price
+        self.quantity = quantity
+        self.listings = listings
@@ -0,0 +1,17 @@
+class Realm:
+    """
+    Realm, which is a member of a connected realm. Players enter realm names, auction data is published per connected
+    realm.
+    """
+    __slots__ = ('region', 'slug', 'name', 'connected_realm_id')
+
+    region: str
+    slug: str
+    name: str
+    connected_realm_id: int
+
+    def __init__(self, region: str, slug: str, name: str, connected_realm_id: int):
+        self.region = region
+        self.slug = slug
+        self.name = name
+        self.connected_realm_id = connected_realm_id
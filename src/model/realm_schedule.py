@@ -0,0 +1,28 @@
+from typing import Optional
+
+
+class RealmSchedule:
+    __slots__ = ('connected_realm_id', 'interval', 'last_modified', 'next_check', 'misses')
+
+    connected_realm_id: int
+    interval: int  # estimated auction data publish interval, seconds
+    last_modified: Optional[int]  # timestamp of the last evaluated auction data
+    next_check: int  # timestamp of the next fetch
+    misses: int  # number of consecutive fetches without new auction data
+
+    def __init__(
+            self,
+            connected_realm_id: int,
+            interval: int,
+            last_modified: Optional[int],
+            next_check: int,
+            misses: int
+    ):
+        self.connected_realm_id = connected_realm_id
+        self.interval = interval
+        self.last_modified = last_modified
+        self.next_check = next_check
+        self.misses = misses
+
+    def __str__(self):
+        return f"connected_realm_id={self.connected_realm_id}"
@@ -1,4 +1,6 @@
 class User:
+    __slots__ = ('user_id', 'telegram_id', 'level')
+
     user_id: int
     telegram_id: int
     level: int
@@ -0,0 +1,197 @@
+import contextlib
+import cProfile
+import functools
+import itertools
+import json
+import logging
+import os
+import pstats
+import threading
+import time
+from typing import Optional, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# functions of these files are listed in the profile summary of a trace
+PROFILED_FILES = ('check.py', 'wow_game_api.py', 'auction_parser.py', 'order_book.py')
+PROFILE_TOP = 50
+
+T = TypeVar('T')
+
+_enabled = False
+_profile = False
+_directory = 'traces'
+_local = threading.local()
+_ids = itertools.count(1)
+_NOOP = contextlib.nullcontext()
+
+
+class Trace:
+    """
+    Tree of spans, which is written to disk as JSON once all of its spans are ended.
+    """
+
+    def __init__(self, name: str):
+        self.trace_id = next(_ids)
+        self.name = name
+        self.root: Optional[Span] = None
+        self.profile: Optional[pstats.Stats] = None
+        self._open_spans = 0
+        self._lock = threading.Lock()
+
+    def on_span_started(self):
+        with self._lock:
+            self._open_spans += 1
+
+    def on_span_ended(self):
+        with self._lock:
+            self._open_spans -= 1
+            finished = self._open_spans == 0
+        if finished:
+            _write(self)
+
+    def add_profile(self, profiler: cProfile.Profile):
+        with self._lock:
+            if self.profile is None:
+                self.profile = pstats.Stats(profiler)
+            else:
+                self.profile.add(profiler)
+
+
+class Span:
+    __slots__ = ('trace', 'name', 'attrs', 'start', 'duration', 'children', '_started')
+
+    def __init__(self, trace: Trace, name: str, attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self.duration: Optional[float] = None
+        self.children: list[Span] = []
+        self._started = time.perf_counter()
+        trace.on_span_started()
+
+    def child(self, name: str, **attrs) -> 'Span':
+        span = Span(self.trace, name, attrs)
+        self.children.append(span)
+        return span
+
+    def end(self, **attrs):
+        self.attrs.update(attrs)
+        self.duration = time.perf_counter() - self._started
+        self.trace.on_span_ended()
+
+    def to_json(self) -> dict:
+        return {
+            'name': self.name,
+            'attrs': self.attrs,
+            'start': self.start,
+            'duration': self.duration,
+            'children': [child.to_json() for child in self.children]
+        }
+
+
+def configure(enabled: bool, profile: bool, directory: str):
+    global _enabled, _profile, _directory
+    _enabled = enabled
+    _profile = profile
+    _directory = directory
+    logger.info(f"tracing enabled={enabled}, profile={profile}, directory={directory}")
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def start_trace(name: str, **attrs) -> Optional[Span]:
+    """
+    Starts a new trace and returns its root span, if tracing is enabled.
+    """
+    if not _enabled:
+        return None
+    trace = Trace(name)
+    trace.root = Span(trace, name, attrs)
+    return trace.root
+
+
+def span(name: str, **attrs):
+    """
+    Context manager recording a child span of the current span of this thread, does nothing when there is none.
+    """
+    parent: Optional[Span] = getattr(_local, 'span', None)
+    if parent is None:
+        return _NOOP
+    return _activate(parent.child(name, **attrs), profile=False)
+
+
+def wrap(parent: Optional[Span], name: str, func: Callable[..., T], **attrs) -> Callable[..., T]:
+    """
+    Returns `func` running in a child span of `parent` and profiled, if profiling is enabled. Returns `func` itself,
+    if `parent` is `None`.
+    """
+    if parent is None:
+        return func
+
+    @functools.wraps(func)
+    def traced(*args, **kwargs):
+        with _activate(parent.child(name, **attrs), profile=_profile):
+            return func(*args, **kwargs)
+
+    return traced
+
+
+@contextlib.contextmanager
+def _activate(current: Span, profile: bool):
+    previous = getattr(_local, 'span', None)
+    _local.span = current
+    profiler = None
+    if profile:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # another profiler is active in this process
+            profiler = None
+    try:
+        yield current
+    finally:
+        if profiler:
+            profiler.disable()
+            current.trace.add_profile(profiler)
+        _local.span = previous
+        current.end()
+
+
+def _write(trace: Trace):
+    if not trace.root.children:
+        return
+    data = {'trace_id': trace.trace_id, 'root': trace.root.to_json()}
+    if trace.profile:
+        data['profile'] = _profile_summary(trace.profile)
+    name = f"{trace.name}-{time.strftime('%Y%m%dT%H%M%S', time.localtime(trace.root.start))}-{trace.trace_id}"
+    try:
+        os.makedirs(_directory, exist_ok=True)
+        with open(os.path.join(_directory, f"{name}.json"), 'w') as file:
+            json.dump(data, file)
+        if trace.profile:
+            trace.profile.dump_stats(os.path.join(_directory, f"{name}.pstats"))
+    except OSError as e:
+        logger.error(f"failed to write trace {name}: {e}")
+        return
+    logger.info(f"wrote trace {name}, duration={trace.root.duration:.3f}s")
+
+
+def _profile_summary(stats: pstats.Stats) -> list[dict]:
+    entries = []
+    for (file, line, function), (_, calls, tottime, cumtime, _) in stats.stats.items():
+        if os.path.basename(file) in PROFILED_FILES:
+            entries.append({
+                'function': function,
+                'file': os.path.basename(file),
+                'line': line,
+                'calls': calls,
+                'tottime': tottime,
+                'cumtime': cumtime
+            })
+    entries.sort(key=lambda e: e['cumtime'], reverse=True)
+    return entries[:PROFILE_TOP]
@@ -0,0 +1,74 @@
+import codecs
+import json
+import re
+from typing import Iterable, Iterator
+
+from model.auction import Auction
+
+CHUNK_SIZE = 64 * 1024
+
+_AUCTIONS_KEY = re.compile(r'"auctions"\s*:\s*\[')
+_AUCTIONS_KEY_TAIL = 32
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_auctions(chunks: Iterable[bytes]) -> Iterator[dict]:
+    """
+    Incrementally decodes entries of the top-level "auctions" array from a stream of raw JSON chunks.
+    Only a single auction entry is decoded at a time, the rest of the document is never materialized.
+    Raises `ValueError`, if the stream ends before the end of the array.
+    """
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder('utf-8')()
+    buffer = ''
+    in_array = False
+    for chunk in chunks:
+        buffer += text_decoder.decode(chunk)
+        pos = 0
+        if not in_array:
+            match = _AUCTIONS_KEY.search(buffer)
+            if not match:
+                # keep the tail in case the key is split between chunks
+                buffer = buffer[-_AUCTIONS_KEY_TAIL:]
+                continue
+            in_array = True
+            pos = match.end()
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == ']':
+                return
+            try:
+                auction, pos_end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # entry is split between chunks
+                break
+            pos = pos_end
+            yield auction
+        buffer = buffer[pos:]
+    if not in_array:
+        raise ValueError('"auctions" array not found in auction data')
+    raise ValueError('auction data is truncated')
+
+
+def parse_auctions(chunks: Iterable[bytes], item_ids: Iterable[int], whole_lots: bool = False) -> dict[int, Auction]:
+    """
+    Returns auctions of the given items, `whole_lots` keeps quantities of individual lots, see `Auction`.
+    """
+    item_ids = set(item_ids)
+    auctions_data = {}
+    for auction in iter_auctions(chunks):
+        item_id = auction['item']['id']
+        if item_id in item_ids:
+            qty = auction['quantity']
+            price = auction.get('unit_price') or auction.get('buyout')
+            if not price:
+                continue
+            item = auctions_data.get(item_id)
+            if not item:
+                item = auctions_data[item_id] = Auction(item_id, whole_lots)
+            item.add(price, qty)
+    for auction in auctions_data.values():
+        auction.finalize()
+    return auctions_data
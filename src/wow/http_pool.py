@@ -0,0 +1,82 @@
+import logging
+import threading
+from typing import Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class HttpPool:
+    """
+    Thread-safe pool of keep-alive HTTP sessions, one per host.
+    """
+
+    def __init__(self, connect_timeout: float, read_timeout: float, pool_size: int):
+        self._timeout = (connect_timeout, read_timeout)
+        self._pool_size = pool_size
+        self._sessions: dict[str, requests.Session] = {}
+        self._lock = threading.Lock()
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault('timeout', self._timeout)
+        return self._get_session(urlsplit(url).netloc).request(method, url, **kwargs)
+
+    def stats(self) -> dict[str, 'HttpPool.Stats']:
+        """
+        Returns number of opened connections and requests made for each host.
+        """
+        with self._lock:
+            sessions = list(self._sessions.items())
+        result = {}
+        for host, session in sessions:
+            stats = HttpPool.Stats()
+            pools = session.get_adapter(f"https://{host}").poolmanager.pools
+            for key in pools.keys():
+                pool = pools.get(key)
+                if pool:
+                    stats.connections += pool.num_connections
+                    stats.requests += pool.num_requests
+            result[host] = stats
+        return result
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+    def _get_session(self, host: str) -> requests.Session:
+        session: Optional[requests.Session] = self._sessions.get(host)
+        if session:
+            return session
+        with self._lock:
+            session = self._sessions.get(host)
+            if not session:
+                logger.debug(f"creating session for host={host}")
+                session = requests.Session()
+                session.headers['Accept-Encoding'] = 'gzip, deflate'
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[host] = session
+            return session
+
+    class Stats:
+        connections: int
+        requests: int
+
+        def __init__(self):
+            self.connections = 0
+            self.requests = 0
+
+        def __str__(self):
+            return f"connections={self.connections}, requests={self.requests}"
@@ -0,0 +1,82 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+from cachetools import TTLCache
+
+from db.database import Database
+from model.item import Item
+from wow.item_catalog import ItemCatalog
+from wow.wow_game_api import WowGameApi
+
+# expired records are deleted from the database after this many stores
+PRUNE_EVERY = 100
+
+logger = logging.getLogger(__name__)
+
+
+class ItemCache:
+    """
+    Thread-safe item metadata cache in front of `WowGameApi` item lookups, shared by all users. Results are kept in
+    memory with TTL and LRU eviction and persisted in the database, so they survive restarts. Failed and empty
+    lookups are not cached. Items returned by the API are added to the item catalog.
+    """
+
+    def __init__(self, api: WowGameApi, database: Database, catalog: ItemCatalog, max_size: int, ttl: int):
+        self._api = api
+        self._database = database
+        self._catalog = catalog
+        self._ttl = ttl
+        self._items: TTLCache = TTLCache(max_size, ttl)
+        self._searches: TTLCache = TTLCache(max_size, ttl)
+        self._lock = threading.Lock()
+        self._stores = 0
+
+    def item_info_by_id(self, region: str, item_id: int) -> Optional[Item]:
+        key = (region, item_id)
+        with self._lock:
+            item = self._items.get(key)
+        if item:
+            return item
+        now = int(time.time())
+        item = self._database.get_cached_item(region, item_id, now - self._ttl)
+        if not item:
+            item = self._api.with_retry(lambda: self._api.item_info_by_id(region, item_id))
+            if not item:
+                return None
+            self._database.set_cached_items(region, [item], now)
+            self._catalog.add([item])
+            self._on_stored(now)
+        with self._lock:
+            self._items[key] = item
+        return item
+
+    def item_info_by_name(self, region: str, item_name: str, max_results: int = 5) -> list[Item]:
+        query = item_name.lower()
+        key = (region, query, max_results)
+        with self._lock:
+            items = self._searches.get(key)
+        if items:
+            return items
+        now = int(time.time())
+        items = self._database.get_cached_item_search(region, query, max_results, now - self._ttl)
+        if not items:
+            items = self._api.with_retry(lambda: self._api.item_info_by_name(region, item_name, max_results))
+            if len(items) == 0:
+                return items
+            self._database.set_cached_item_search(region, query, max_results, items, now)
+            self._catalog.add(items)
+            self._on_stored(now)
+        with self._lock:
+            self._searches[key] = items
+            for item in items:
+                self._items[(region, item.item_id)] = item
+        return items
+
+    def _on_stored(self, now: int):
+        with self._lock:
+            self._stores += 1
+            prune = self._stores % PRUNE_EVERY == 0
+        if prune:
+            self._database.delete_expired_item_cache(now - self._ttl)
@@ -0,0 +1,88 @@
+import csv
+import difflib
+import json
+import re
+from typing import Iterator, Optional
+
+from db.database import Database
+from model.item import Item
+from wow.wow_game_api import PARAM_LOCALE
+
+# a query term of at least this many characters also matches names with a typo after its first characters
+FUZZY_PREFIX = 3
+FUZZY_CANDIDATES = 200
+FUZZY_MIN_RATIO = 0.6
+
+_TERM = re.compile(r'\w+')
+
+
+class ItemCatalog:
+    """
+    Local catalog of item names with a full-text index, which answers item searches without the Battle.net API.
+    It is filled from imported dumps, items of notifications and item lookups of `ItemCache`.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+
+    def add(self, items: list[Item]):
+        if items:
+            self._database.add_catalog_items(items)
+
+    def item(self, item_id: int) -> Optional[Item]:
+        return self._database.get_catalog_item(item_id)
+
+    def search(self, query: str, max_results: int) -> list[Item]:
+        """
+        Returns items, which names contain words starting with all words of `query`, best matches first.
+        """
+        terms = [term.lower() for term in _TERM.findall(query)]
+        if not terms:
+            return []
+        name = ' '.join(query.split())
+        match = ' '.join(f'"{term}"*' for term in terms)
+        return self._database.search_item_catalog(match, name, max_results)
+
+    def search_similar(self, query: str, max_results: int) -> list[Item]:
+        """
+        Fuzzy search for queries with typos: returns items, which names are similar to `query` and share the first
+        characters of one of its words, most similar first.
+        """
+        terms = [term.lower() for term in _TERM.findall(query)]
+        prefixes = [term[:FUZZY_PREFIX] for term in terms if len(term) >= FUZZY_PREFIX]
+        if not prefixes:
+            return []
+        match = ' OR '.join(f'"{prefix}"*' for prefix in prefixes)
+        candidates = self._database.search_item_catalog(match, '', FUZZY_CANDIDATES)
+        query = ' '.join(terms)
+        scored = []
+        for item in candidates:
+            ratio = difflib.SequenceMatcher(None, query, item.name.lower()).ratio()
+            if ratio >= FUZZY_MIN_RATIO:
+                scored.append((ratio, item))
+        scored.sort(key=lambda e: e[0], reverse=True)
+        return [item for _, item in scored[:max_results]]
+
+
+def read_dump(path: str) -> Iterator[Item]:
+    """
+    Reads items of a dump file: either CSV with `id,name[,commodity]` rows or JSON lines with Battle.net item documents
+    (`id`, `name` as a string or localized names, optional `is_stackable`).
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if path.endswith('.csv'):
+            for row in csv.reader(file):
+                if not row or not row[0].strip().isdigit():
+                    # header or empty line
+                    continue
+                commodity = row[2].strip().lower() in ('1', 'true') if len(row) > 2 and row[2].strip() else None
+                yield Item(int(row[0]), row[1].strip(), commodity)
+        else:
+            for line in file:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                name = data['name']
+                if isinstance(name, dict):
+                    name = name.get(PARAM_LOCALE) or next(iter(name.values()))
+                yield Item(int(data['id']), name, data.get('is_stackable'))
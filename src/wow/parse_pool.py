@@ -0,0 +1,77 @@
+import functools
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Iterable, Optional
+
+from model.auction import Auction
+from wow.auction_parser import CHUNK_SIZE, parse_auctions
+
+logger = logging.getLogger(__name__)
+
+
+class ParsePool:
+    """
+    Parses auction data in worker processes, so parsing of many connected realms is not serialized by the GIL.
+    Raw auction data is streamed to workers through temporary files, so it is never held in memory as a whole, and
+    workers return only the aggregated price levels of the watched items.
+
+    Workers are started through a fork server, which is a fresh single-threaded process, so they never inherit locks
+    held by threads of the bot. They import the main module, which must not start the bot when it is imported.
+    """
+
+    def __init__(self, processes: int):
+        self._processes = processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def parse(self, chunks: Iterable[bytes], item_ids: Iterable[int], whole_lots: bool) -> dict[int, Auction]:
+        """
+        Writes `chunks` to a temporary file in the calling thread and blocks until a worker has parsed it.
+        """
+        file = tempfile.NamedTemporaryFile(prefix='auctions-', delete=False)
+        try:
+            with file:
+                for chunk in chunks:
+                    file.write(chunk)
+            executor = self._get_executor()
+            try:
+                return executor.submit(_parse, file.name, list(item_ids), whole_lots).result()
+            except BrokenProcessPool:
+                # a worker died, e.g. ran out of memory, the pool is replaced for later calls
+                self._replace_executor(executor)
+                raise
+        finally:
+            os.remove(file.name)
+
+    def close(self):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor:
+            executor.shutdown(cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context('forkserver')
+                self._executor = ProcessPoolExecutor(self._processes, mp_context=context)
+            return self._executor
+
+    def _replace_executor(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            if self._executor is not broken:
+                # already replaced by another thread
+                return
+            self._executor = None
+        logger.error('parse worker process died, restarting the pool')
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _parse(path: str, item_ids: list[int], whole_lots: bool) -> dict[int, Auction]:
+    with open(path, 'rb') as file:
+        return parse_auctions(iter(functools.partial(file.read, CHUNK_SIZE), b''), item_ids, whole_lots)
@@ -0,0 +1,71 @@
+import difflib
+import re
+import threading
+import unicodedata
+from typing import Optional
+
+from db.database import Database
+from model.connected_realm import ConnectedRealm
+from model.realm import Realm
+
+FUZZY_CUTOFF = 0.8
+
+_SEPARATORS = re.compile(r'[\s_]+')
+_STRIPPED = re.compile(r"[^a-z0-9-]")
+
+
+def slugify(name: str) -> str:
+    """
+    Returns the Battle.net slug of a realm name, e.g. "Aggra (Português)" -> "aggra-portugues".
+    """
+    ascii_name = unicodedata.normalize('NFKD', name).encode('ascii', 'ignore').decode('ascii')
+    slug = _STRIPPED.sub('', _SEPARATORS.sub('-', ascii_name.strip().lower()))
+    return re.sub('-{2,}', '-', slug).strip('-')
+
+
+def _key(name: str) -> str:
+    # unlike slugs, keys keep non-latin letters
+    decomposed = unicodedata.normalize('NFKD', name.lower())
+    return ''.join(c for c in decomposed if c.isalnum() and not unicodedata.combining(c))
+
+
+class RealmCatalog:
+    """
+    Resolves entered realm names to connected realms locally, using names of all realms stored in the database. Names
+    are matched ignoring case, accents, spaces and punctuation, and then fuzzily to tolerate typos.
+    """
+
+    def __init__(self, database: Database):
+        self._database = database
+        self._keys: dict[str, dict[str, int]] = {}  # region -> realm name key -> connected realm id
+        self._lock = threading.Lock()
+
+    def update(self, region: str, realms: list[Realm]):
+        self._database.set_realms(region, realms)
+        with self._lock:
+            self._keys.pop(region, None)
+
+    def resolve(self, region: str, name: str) -> Optional[ConnectedRealm]:
+        keys = self._region_keys(region)
+        key = _key(name)
+        if not key:
+            return None
+        connected_realm_id = keys.get(key)
+        if connected_realm_id is None:
+            matches = difflib.get_close_matches(key, keys.keys(), n=1, cutoff=FUZZY_CUTOFF)
+            if not matches:
+                return None
+            connected_realm_id = keys[matches[0]]
+        return self._database.get_connected_realm_by_id(connected_realm_id)
+
+    def _region_keys(self, region: str) -> dict[str, int]:
+        with self._lock:
+            keys = self._keys.get(region)
+        if keys is None:
+            keys = {}
+            for realm in self._database.get_realms(region):
+                keys[_key(realm.slug)] = realm.connected_realm_id
+                keys[_key(realm.name)] = realm.connected_realm_id
+            with self._lock:
+                self._keys[region] = keys
+        return keys
@@ -0,0 +1,172 @@
+import email.utils
+import gzip
+import logging
+import os
+import re
+import tempfile
+import threading
+from typing import Optional, Iterator, Iterable
+
+from wow.auction_parser import CHUNK_SIZE
+
+SUFFIX = '.json.gz'
+TEMP_SUFFIX = '.tmp'
+COMPRESS_LEVEL = 1
+
+_FILE_NAME = re.compile(r'^(?P<key>[\w-]+)\.(?P<last_modified>\d+)' + re.escape(SUFFIX) + '$')
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """
+    Thread-safe on-disk store of the most recent raw auction data per key, gzip-compressed and evicted by total size.
+    File names are `<key>.<last modified timestamp>.json.gz`.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        self._directory = directory
+        self._max_size = max_size
+        self._lock = threading.Lock()
+        self._snapshots: dict[str, int] = {}
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.endswith(TEMP_SUFFIX):
+                # left by an interrupted download
+                os.remove(os.path.join(directory, name))
+                continue
+            match = _FILE_NAME.match(name)
+            if not match:
+                continue
+            key = match.group('key')
+            last_modified = int(match.group('last_modified'))
+            previous = self._snapshots.get(key)
+            if previous is not None and previous >= last_modified:
+                self._remove(key, last_modified)
+                continue
+            if previous is not None:
+                self._remove(key, previous)
+            self._snapshots[key] = last_modified
+        logger.info(f"loaded {len(self._snapshots)} auction snapshots from {directory}")
+
+    def last_modified(self, key: str) -> Optional[str]:
+        """
+        Returns the `Last-Modified` value of the stored snapshot as an HTTP date.
+        """
+        with self._lock:
+            timestamp = self._snapshots.get(key)
+        if timestamp is None:
+            return None
+        return email.utils.formatdate(timestamp, usegmt=True)
+
+    def chunks(self, key: str) -> Optional[Iterator[bytes]]:
+        """
+        Returns decompressed chunks of the stored snapshot or `None`, if there is no snapshot.
+        """
+        with self._lock:
+            timestamp = self._snapshots.get(key)
+            if timestamp is None:
+                return None
+            path = self._path(key, timestamp)
+            try:
+                file = gzip.open(path, 'rb')
+                os.utime(path)
+            except OSError as e:
+                logger.warning(f"failed to open auction snapshot {path}: {e}")
+                self._snapshots.pop(key, None)
+                return None
+        return _read_chunks(file)
+
+    def writer(self, key: str, last_modified: str) -> Optional['SnapshotCache.Writer']:
+        """
+        Returns a writer of a new snapshot or `None`, if `last_modified` is not a valid HTTP date.
+        """
+        try:
+            timestamp = int(email.utils.parsedate_to_datetime(last_modified).timestamp())
+        except (TypeError, ValueError):
+            logger.warning(f"invalid Last-Modified value: {last_modified}")
+            return None
+        return SnapshotCache.Writer(self, key, timestamp)
+
+    def _commit(self, key: str, timestamp: int, temp_path: str):
+        with self._lock:
+            os.replace(temp_path, self._path(key, timestamp))
+            previous = self._snapshots.get(key)
+            if previous is not None and previous != timestamp:
+                self._remove(key, previous)
+            self._snapshots[key] = timestamp
+            self._evict()
+
+    def _evict(self):
+        files = []
+        total_size = 0
+        for key, timestamp in self._snapshots.items():
+            try:
+                stat = os.stat(self._path(key, timestamp))
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, key, timestamp))
+            total_size += stat.st_size
+        files.sort()
+        for _, size, key, timestamp in files:
+            if total_size <= self._max_size:
+                break
+            self._remove(key, timestamp)
+            del self._snapshots[key]
+            total_size -= size
+            logger.info(f"evicted auction snapshot {key}")
+
+    def _remove(self, key: str, timestamp: int):
+        try:
+            os.remove(self._path(key, timestamp))
+        except OSError as e:
+            logger.warning(f"failed to remove auction snapshot {key}: {e}")
+
+    def _path(self, key: str, timestamp: int) -> str:
+        return os.path.join(self._directory, f"{key}.{timestamp}{SUFFIX}")
+
+    class Writer:
+        """
+        Context manager, which copies downloaded chunks into a new snapshot. The snapshot is stored on successful exit,
+        after reading chunks left unconsumed by the parser.
+        """
+
+        def __init__(self, cache: 'SnapshotCache', key: str, timestamp: int):
+            self._cache = cache
+            self._key = key
+            self._timestamp = timestamp
+            self._source: Optional[Iterator[bytes]] = None
+            fd, self._temp_path = tempfile.mkstemp(dir=cache._directory, suffix=TEMP_SUFFIX)
+            self._raw_file = os.fdopen(fd, 'wb')
+            self._file = gzip.GzipFile(fileobj=self._raw_file, mode='wb', compresslevel=COMPRESS_LEVEL)
+
+        def tee(self, chunks: Iterable[bytes]) -> Iterator[bytes]:
+            self._source = iter(chunks)
+            for chunk in self._source:
+                self._file.write(chunk)
+                yield chunk
+
+        def __enter__(self) -> 'SnapshotCache.Writer':
+            return self
+
+        def __exit__(self, exc_type, exc_val, exc_tb):
+            try:
+                if exc_type is None and self._source is not None:
+                    for chunk in self._source:
+                        self._file.write(chunk)
+                self._file.close()
+                self._raw_file.close()
+                if exc_type is None:
+                    self._cache._commit(self._key, self._timestamp, self._temp_path)
+            finally:
+                if os.path.exists(self._temp_path):
+                    os.remove(self._temp_path)
+
+
+def _read_chunks(file: gzip.GzipFile) -> Iterator[bytes]:
+    with file:
+        while True:
+            chunk = file.read(CHUNK_SIZE)
+            if not chunk:
+                return
+            yield chunk
@@ -0,0 +1,134 @@
+import logging
+import threading
+import time
+from typing import Optional
+
+import metrics
+from wow.http_pool import HttpPool
+
+# tokens are refreshed in the background this long before they expire
+REFRESH_AHEAD = 300  # seconds
+REFRESH_RETRY_INTERVAL = 30  # seconds
+DEFAULT_EXPIRES_IN = 3600  # seconds, if the token response has no `expires_in`
+
+logger = logging.getLogger(__name__)
+
+_REFRESHES = metrics.Counter('wow_token_refreshes_total', 'Battle.net access token requests', ('result',))
+
+
+class TokenManager:
+    """
+    Thread-safe holder of the Battle.net OAuth access token. Only one token request is made at a time, while other
+    callers wait for its result. Once a token is obtained, it is refreshed in the background ahead of its expiry, so
+    callers are not blocked by token requests.
+    """
+
+    def __init__(self, http: HttpPool, token_url: str, client_id: str, client_secret: str):
+        self._http = http
+        self._token_url = token_url
+        self._client_id = client_id
+        self._client_secret = client_secret
+        self._token: Optional[str] = None
+        self._expires_at = 0.0  # monotonic
+        self._refreshing = False
+        self._error: Optional[Exception] = None
+        self._condition = threading.Condition()
+        self._closed = threading.Event()
+        self._refresher: Optional[threading.Thread] = None
+
+    def get(self) -> str:
+        """
+        Returns a valid access token, fetching a new one if there is none.
+        """
+        with self._condition:
+            while not self._token or time.monotonic() >= self._expires_at:
+                if not self._refreshing:
+                    self._refreshing = True
+                    break
+                self._condition.wait()
+                if self._error:
+                    raise self._error
+            else:
+                return self._token
+        return self._refresh()
+
+    def invalidate(self, token: str):
+        """
+        Drops `token` after it was rejected, unless it has already been replaced.
+        """
+        with self._condition:
+            if self._token == token:
+                self._token = None
+
+    def close(self):
+        self._closed.set()
+
+    def _refresh(self) -> str:
+        """
+        Fetches a new token and wakes up waiting callers, the calling thread must have set `_refreshing`.
+        """
+        token = None
+        expires_in = 0
+        error = None
+        try:
+            token, expires_in = self._request()
+            _REFRESHES.inc('success')
+        except Exception as e:
+            _REFRESHES.inc('error')
+            error = e
+        with self._condition:
+            if token:
+                self._token = token
+                self._expires_at = time.monotonic() + expires_in
+            self._error = error
+            self._refreshing = False
+            self._condition.notify_all()
+        if error:
+            raise error
+        logger.info(f"refreshed access token, expires in {expires_in}s")
+        self._start_refresher()
+        return token
+
+    def _request(self) -> tuple[str, int]:
+        response = self._http.post(
+            self._token_url,
+            auth=(self._client_id, self._client_secret),
+            data={'grant_type': 'client_credentials'}
+        )
+        if response.status_code != 200:
+            raise ValueError(f"failed to fetch access token:\n{response.text}")
+        data = response.json()
+        token = data.get('access_token')
+        if not token:
+            raise ValueError(f"access token not found in response:\n{response.text}")
+        return token, int(data.get('expires_in', DEFAULT_EXPIRES_IN))
+
+    def _start_refresher(self):
+        with self._condition:
+            if self._refresher:
+                return
+            self._refresher = threading.Thread(name='token-refresh', target=self._refresh_loop, daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        delay = self._next_refresh_delay()
+        while not self._closed.wait(delay):
+            with self._condition:
+                if self._refreshing:
+                    # a caller is fetching a new token right now
+                    delay = REFRESH_RETRY_INTERVAL
+                    continue
+                self._refreshing = True
+            try:
+                self._refresh()
+                delay = self._next_refresh_delay()
+            except Exception as e:
+                logger.error(f"failed to refresh access token: {e}")
+                delay = REFRESH_RETRY_INTERVAL
+
+    def _next_refresh_delay(self) -> float:
+        with self._condition:
+            expires_at = self._expires_at
+        # tokens shorter lived than twice the refresh margin are refreshed at half of their lifetime
+        lifetime = expires_at - time.monotonic()
+        return max(lifetime - REFRESH_AHEAD, lifetime / 2, 0)
@@ -1,12 +1,23 @@
-import hashlib
+import email.utils
 import logging
-from typing import Optional, Callable, TypeVar
+import random
+import time
+from typing import Optional, Callable, TypeVar, Iterator
 
 import requests
 
+import metrics
+import tracing
 from model.auction import Auction
 from model.connected_realm import ConnectedRealm
 from model.item import Item
+from model.realm import Realm
+from rate_limiter import TokenBucket
+from wow.auction_parser import parse_auctions, CHUNK_SIZE
+from wow.http_pool import HttpPool
+from wow.parse_pool import ParsePool
+from wow.snapshot_cache import SnapshotCache
+from wow.token_manager import TokenManager
 
 REGIONS = ['us', 'eu', 'kr', 'tw']
 
@@ -15,31 +26,75 @@ DATA_URL = 'https://%s.api.blizzard.com'
 
 PATH_SEARCH_CONNECTED_REALM = '/data/wow/search/connected-realm'
 PATH_AUCTION_CONNECTED_REALM = '/data/wow/connected-realm/%d/auctions'
+PATH_AUCTION_COMMODITIES = '/data/wow/auctions/commodities'
 PATH_ITEM = '/data/wow/item/%d'
 PATH_ITEM_SEARCH = '/data/wow/search/item'
 
 PARAM_DYNAMIC_NAMESPACE = 'dynamic-%s'
 PARAM_STATIC_NAMESPACE = 'static-%s'
 PARAM_LOCALE = 'en_US'
+PARAM_MAX_PAGE_SIZE = 1000
+
+# published quotas of a Battle.net API client
+RATE_LIMIT = 100  # requests per second
+HOURLY_LIMIT = 36000  # requests per hour
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 0.5  # seconds
+BACKOFF_MAX = 30  # seconds
 
 logger = logging.getLogger(__name__)
 
+_RESPONSE_SECONDS = metrics.Histogram(
+    'wow_auction_response_seconds', 'Time to response headers of auction data requests', ('source', 'status'))
+_PARSE_SECONDS = metrics.Histogram(
+    'wow_auction_parse_seconds', 'Time to download and parse auction data body', ('source',))
+_DOWNLOAD_BYTES = metrics.Counter(
+    'wow_auction_download_bytes_total', 'Downloaded auction data bytes, after decompression', ('source',))
+_LOTS_INGESTED = metrics.Counter(
+    'wow_auction_lots_ingested_total', 'Lots of watched items ingested from auction data', ('source',))
+_RETRIES = metrics.Counter('wow_api_retries_total', 'Battle.net API requests retried after an error', ('status',))
+
 
 class WowGameApi:
 
-    def __init__(self, client_id: str, client_secret: str):
-        self._client_id = client_id
-        self._client_secret = client_secret
-        self._access_token = None
+    def __init__(
+            self,
+            client_id: str,
+            client_secret: str,
+            http: HttpPool,
+            snapshots: Optional[SnapshotCache] = None,
+            token_url: str = TOKEN_URL,
+            data_url: str = DATA_URL,
+            rate_limit: float = RATE_LIMIT,
+            hourly_limit: int = HOURLY_LIMIT,
+            parse_pool: Optional[ParsePool] = None
+    ):
+        """
+        `data_url` is formatted with the region. `rate_limit` and `hourly_limit` are shared by all threads. Auction
+        data is parsed by `parse_pool`, if it is set, otherwise in the calling thread.
+        """
+        self._parse_pool = parse_pool
+        self._data_url = data_url
+        self._second_limit = TokenBucket(rate_limit, rate_limit)
+        self._hour_limit = TokenBucket(hourly_limit / 3600, hourly_limit)
+        self._tokens = TokenManager(http, token_url, client_id, client_secret)
+        self._last_modified = {}
+        self._commodities_last_modified = {}
+        self._http = http
+        self._snapshots = snapshots
 
     def connected_realm(self, region: str, slug: str) -> Optional[ConnectedRealm]:
         params = {
             'namespace': PARAM_DYNAMIC_NAMESPACE % region,
             'realms.slug': slug
         }
-        headers = {'Authorization': f"Bearer {self._get_access_token()}"}
-        response = requests.get(f"{DATA_URL % region}{PATH_SEARCH_CONNECTED_REALM}", headers=headers, params=params)
-        self._check_status_code(response.status_code)
+        token = self._tokens.get()
+        headers = {'Authorization': f"Bearer {token}"}
+        response = self._get(
+            f"{self._data_url % region}{PATH_SEARCH_CONNECTED_REALM}", headers=headers, params=params)
+        self._check_status_code(response.status_code, token)
         if response.status_code != 200:
             logger.error(f"failed to find connected realm: status={response.status_code}\n{response.text}")
             return None
@@ -56,57 +111,102 @@ class WowGameApi:
         logger.info(f"no connected realms found for slug={slug}")
         return None
 
-    def auctions(self, region: str, connected_realm_id: int, item_ids: list[int]) -> dict[int, Auction]:
-        params = {
-            'namespace': PARAM_DYNAMIC_NAMESPACE % region,
-            'locale': PARAM_LOCALE
-        }
-        headers = {'Authorization': f"Bearer {self._get_access_token()}"}
-        response = requests.get(
-            f"{DATA_URL % region}{PATH_AUCTION_CONNECTED_REALM % connected_realm_id}", headers=headers, params=params)
-        self._check_status_code(response.status_code)
-        if response.status_code != 200:
-            logger.error(f"failed to fetch auction data for connected_realm_id={connected_realm_id}: "
-                         f"status={response.status_code}\n{response.text}")
-            return {}
-        auctions_data = {}
-        auctions = response.json()['auctions']
-        for auction in auctions:
-            item_id = auction['item']['id']
-            if item_id in item_ids:
-                qty = auction['quantity']
-                price = auction.get('unit_price') or auction.get('buyout')
-                if not price:
-                    continue
-                item = auctions_data.setdefault(item_id, Auction(item_id))
-                item.lots.append(Auction.Lot(price, qty))
-        for _, auction in auctions_data.items():
-            auction.lots.sort(key=lambda lot: lot.price)
-        return auctions_data
-
-    def auctions_snapshot(self, region, connected_realm_id) -> Optional[str]:
-        params = {
-            'namespace': PARAM_DYNAMIC_NAMESPACE % region,
-            'locale': PARAM_LOCALE
-        }
-        headers = {'Authorization': f"Bearer {self._get_access_token()}"}
-        response = requests.get(
-            f"{DATA_URL % region}{PATH_AUCTION_CONNECTED_REALM % connected_realm_id}", headers=headers, params=params)
-        self._check_status_code(response.status_code)
-        if response.status_code != 200:
-            logger.error(f"failed to fetch auction data for connected_realm_id={connected_realm_id}: "
-                         f"status={response.status_code}\n{response.text}")
-            return None
-        return hashlib.sha1(response.content).hexdigest()
+    def realms(self, region: str) -> Optional[list[Realm]]:
+        """
+        Returns every realm of the region with its connected realm, or `None`, if the index could not be fetched.
+        """
+        token = self._tokens.get()
+        headers = {'Authorization': f"Bearer {token}"}
+        realms = []
+        page = 1
+        page_count = 1
+        while page <= page_count:
+            params = {
+                'namespace': PARAM_DYNAMIC_NAMESPACE % region,
+                '_pageSize': PARAM_MAX_PAGE_SIZE,
+                '_page': page
+            }
+            response = self._get(
+                f"{self._data_url % region}{PATH_SEARCH_CONNECTED_REALM}", headers=headers, params=params)
+            self._check_status_code(response.status_code, token)
+            if response.status_code != 200:
+                logger.error(f"failed to fetch connected realms of {region}: "
+                             f"status={response.status_code}\n{response.text}")
+                return None
+            data = response.json()
+            for result in data['results']:
+                connected_realm_id = result['data']['id']
+                for realm in result['data']['realms']:
+                    realms.append(Realm(region, realm['slug'], realm['name'][PARAM_LOCALE], connected_realm_id))
+            page_count = data.get('pageCount', 1)
+            page += 1
+        return realms
+
+    def auctions(
+            self,
+            region: str,
+            connected_realm_id: int,
+            item_ids: list[int],
+            if_modified_since: Optional[str] = None
+    ) -> Optional[dict[int, Auction]]:
+        """
+        Fetches auction data for the given items. If `if_modified_since` is set and the auction data has not been
+        updated since then, returns `None`. Otherwise, unchanged auction data is read from the snapshot cache.
+        """
+        return self._auctions(
+            region,
+            PATH_AUCTION_CONNECTED_REALM % connected_realm_id,
+            item_ids,
+            if_modified_since,
+            self._last_modified,
+            connected_realm_id,
+            auction_source(region, connected_realm_id)
+        )
+
+    def commodities(
+            self,
+            region: str,
+            item_ids: list[int],
+            if_modified_since: Optional[str] = None
+    ) -> Optional[dict[int, Auction]]:
+        """
+        Fetches region-wide commodities auction data for the given items. If `if_modified_since` is set and the
+        auction data has not been updated since then, returns `None`. Otherwise, unchanged auction data is read from
+        the snapshot cache.
+        """
+        return self._auctions(
+            region,
+            PATH_AUCTION_COMMODITIES,
+            item_ids,
+            if_modified_since,
+            self._commodities_last_modified,
+            region,
+            auction_source(region)
+        )
+
+    def last_modified(self, connected_realm_id: int) -> Optional[str]:
+        """
+        Returns the `Last-Modified` value of the most recently fetched auction data of the connected realm, or `None`,
+        if the last fetch failed.
+        """
+        return self._last_modified.get(connected_realm_id)
+
+    def commodities_last_modified(self, region: str) -> Optional[str]:
+        """
+        Returns the `Last-Modified` value of the most recently fetched commodities auction data of the region, or
+        `None`, if the last fetch failed.
+        """
+        return self._commodities_last_modified.get(region)
 
     def item_info_by_id(self, region: str, item_id: int) -> Optional[Item]:
         params = {
             'namespace': PARAM_STATIC_NAMESPACE % region,
             'locale': PARAM_LOCALE
         }
-        headers = {'Authorization': f"Bearer {self._get_access_token()}"}
-        response = requests.get(f"{DATA_URL % region}{PATH_ITEM % item_id}", headers=headers, params=params)
-        self._check_status_code(response.status_code)
+        token = self._tokens.get()
+        headers = {'Authorization': f"Bearer {token}"}
+        response = self._get(f"{self._data_url % region}{PATH_ITEM % item_id}", headers=headers, params=params)
+        self._check_status_code(response.status_code, token)
         if response.status_code == 404:
             logger.info(f"item with id={item_id} not found")
             return None
@@ -114,8 +214,8 @@ class WowGameApi:
             logger.error(f"failed to fetch item id={item_id} info: "
                          f"status={response.status_code}\n{response.text}")
             return None
-        name = response.json()['name']
-        return Item(item_id, name)
+        data = response.json()
+        return Item(item_id, data['name'], data.get('is_stackable'))
 
     def item_info_by_name(self, region: str, item_name: str, max_results: int = 5) -> list[Item]:
         params = {
@@ -123,9 +223,10 @@ class WowGameApi:
             'name.%s' % PARAM_LOCALE: item_name,
             '_pageSize': max_results
         }
-        headers = {'Authorization': f"Bearer {self._get_access_token()}"}
-        response = requests.get(f"{DATA_URL % region}{PATH_ITEM_SEARCH}", headers=headers, params=params)
-        self._check_status_code(response.status_code)
+        token = self._tokens.get()
+        headers = {'Authorization': f"Bearer {token}"}
+        response = self._get(f"{self._data_url % region}{PATH_ITEM_SEARCH}", headers=headers, params=params)
+        self._check_status_code(response.status_code, token)
         if response.status_code != 200:
             logger.error(f"failed to fetch item name={item_name} info: "
                          f"status={response.status_code}\n{response.text}")
@@ -135,9 +236,18 @@ class WowGameApi:
             data = node['data']
             item_id = data['id']
             item_name = data['name'][PARAM_LOCALE]
-            results.append(Item(item_id, item_name))
+            results.append(Item(item_id, item_name, data.get('is_stackable')))
         return results
 
+    def connection_stats(self) -> dict[str, HttpPool.Stats]:
+        return self._http.stats()
+
+    def close(self):
+        self._tokens.close()
+        self._http.close()
+        if self._parse_pool:
+            self._parse_pool.close()
+
     T = TypeVar('T')
 
     def with_retry(self, func: Callable[[], T], max_retries=5) -> T:
@@ -150,26 +260,144 @@ class WowGameApi:
                 if count >= max_retries:
                     raise e
 
-    def _check_status_code(self, status_code):
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """
+        Sends a GET request within the rate limits. Requests failed with 429 or 5xx are retried with jittered
+        exponential backoff, or after `Retry-After`, if it is set. Returns the last response, if all attempts fail.
+        """
+        attempt = 0
+        while True:
+            self._hour_limit.acquire()
+            self._second_limit.acquire()
+            response = self._http.get(url, **kwargs)
+            attempt += 1
+            if response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_ATTEMPTS:
+                return response
+            _RETRIES.inc(response.status_code)
+            response.close()
+            retry_after = _retry_after(response)
+            if retry_after is not None:
+                # all threads share the quota, so they all wait
+                logger.warning(f"{url} responded {response.status_code}, retrying after {retry_after:.1f}s")
+                self._second_limit.pause(retry_after)
+            else:
+                delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                logger.warning(f"{url} responded {response.status_code}, retrying in {delay:.1f}s")
+                time.sleep(delay)
+
+    def _parse(self, chunks: Iterator[bytes], item_ids: list[int], path: str) -> dict[int, Auction]:
+        # lots of connected realm auction houses can not be bought partially
+        whole_lots = path != PATH_AUCTION_COMMODITIES
+        if self._parse_pool:
+            return self._parse_pool.parse(chunks, item_ids, whole_lots)
+        return parse_auctions(chunks, item_ids, whole_lots)
+
+    def _check_status_code(self, status_code: int, token: str):
         if status_code == 401:
-            self._access_token = None
+            self._tokens.invalidate(token)
             raise WowGameApi.UnauthorizedError()
 
-    def _get_access_token(self) -> str:
-        if self._access_token:
-            return self._access_token
-        response = requests.post(
-            TOKEN_URL,
-            auth=(self._client_id, self._client_secret),
-            data={'grant_type': 'client_credentials'}
-        )
-        if response.status_code != 200:
-            raise ValueError(f"failed to fetch access token:\n{response.text}")
-        token = response.json()['access_token']
-        if token:
-            self._access_token = token
-            return self._access_token
-        raise ValueError(f"access token not found in response:\n{response.text}")
+    def _auctions(
+            self,
+            region: str,
+            path: str,
+            item_ids: list[int],
+            if_modified_since: Optional[str],
+            last_modified: dict,
+            key,
+            source: str
+    ) -> Optional[dict[int, Auction]]:
+        params = {
+            'namespace': PARAM_DYNAMIC_NAMESPACE % region,
+            'locale': PARAM_LOCALE
+        }
+        token = self._tokens.get()
+        headers = {'Authorization': f"Bearer {token}"}
+        # without `if_modified_since` the caller needs auction data, which is validated against the stored snapshot
+        snapshot_last_modified = None
+        if not if_modified_since and self._snapshots:
+            snapshot_last_modified = self._snapshots.last_modified(source)
+        if if_modified_since or snapshot_last_modified:
+            headers['If-Modified-Since'] = if_modified_since or snapshot_last_modified
+        start = time.perf_counter()
+        with tracing.span('request', source=source):
+            response = self._get(f"{self._data_url % region}{path}", headers=headers, params=params, stream=True)
+        with response:
+            _RESPONSE_SECONDS.observe(time.perf_counter() - start, source, response.status_code)
+            self._check_status_code(response.status_code, token)
+            if response.status_code == 304:
+                if snapshot_last_modified:
+                    chunks = self._snapshots.chunks(source)
+                    if chunks:
+                        logger.debug(f"auction data {path} is not modified, reading snapshot")
+                        last_modified[key] = snapshot_last_modified
+                        with tracing.span('parse_snapshot', source=source):
+                            return self._parse(chunks, item_ids, path)
+                    return self._auctions(region, path, item_ids, None, last_modified, key, source)
+                logger.debug(f"auction data {path} is not modified")
+                return None
+            if response.status_code in RETRY_STATUS_CODES:
+                # not an empty auction house, the check fails and is repeated later
+                raise WowGameApi.RequestError(f"failed to fetch auction data {path}: status={response.status_code}")
+            if response.status_code != 200:
+                logger.error(f"failed to fetch auction data {path}: status={response.status_code}\n{response.text}")
+                # the previous value must not be taken for the timestamp of this empty result
+                last_modified.pop(key, None)
+                return {}
+            start = time.perf_counter()
+            chunks = _count_bytes(response.iter_content(CHUNK_SIZE), source)
+            writer = None
+            if self._snapshots and response.headers.get('Last-Modified'):
+                writer = self._snapshots.writer(source, response.headers['Last-Modified'])
+            with tracing.span('parse', source=source):
+                if writer:
+                    with writer:
+                        auctions = self._parse(writer.tee(chunks), item_ids, path)
+                else:
+                    auctions = self._parse(chunks, item_ids, path)
+            _PARSE_SECONDS.observe(time.perf_counter() - start, source)
+            _LOTS_INGESTED.inc(source, amount=sum(auction.listings for auction in auctions.values()))
+            if response.headers.get('Last-Modified'):
+                last_modified[key] = response.headers['Last-Modified']
+            else:
+                last_modified.pop(key, None)
+            return auctions
 
     class UnauthorizedError(Exception):
         pass
+
+    class RequestError(Exception):
+        pass
+
+
+def auction_source(region: str, connected_realm_id: Optional[int] = None) -> str:
+    """
+    Returns the name of connected realm or region commodities auction data, which is used in metrics and as snapshot
+    cache key.
+    """
+    if connected_realm_id is None:
+        return f"{region}-commodities"
+    return f"{region}-{connected_realm_id}"
+
+
+def _count_bytes(chunks: Iterator[bytes], source: str) -> Iterator[bytes]:
+    for chunk in chunks:
+        _DOWNLOAD_BYTES.inc(source, amount=len(chunk))
+        yield chunk
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """
+    Returns the delay of the `Retry-After` header in seconds, which is either a number of seconds or an HTTP date.
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(value).timestamp() - time.time(), 0)
+    except (TypeError, ValueError):
+        return None
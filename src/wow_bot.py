@@ -7,34 +7,56 @@ from telegram.ext import Updater
 import bot_commands.add_notification
 import bot_commands.list_notifications
 import bot_jobs.check
+import bot_jobs.delivery
+import bot_jobs.history
+import bot_jobs.realms
+import metrics
+import tracing
 from bot_context import BotContext
 
-logging.basicConfig(
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    level=logging.DEBUG if os.getenv('DEBUG') == "1" else logging.INFO
-)
-
-aps_logger = logging.getLogger('apscheduler')
-aps_logger.setLevel(logging.WARNING)
-
 
 def on_exit():
     BotContext.get().database.close()
+    BotContext.get().wow_game_api.close()
+
+
+def main():
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.DEBUG if os.getenv('DEBUG') == "1" else logging.INFO
+    )
+
+    aps_logger = logging.getLogger('apscheduler')
+    aps_logger.setLevel(logging.WARNING)
+
+    # init db
+    BotContext.get().database.migrate()
+    atexit.register(on_exit)
+
+    updater = Updater(token=BotContext.get().bot_env.bot_token, base_url=BotContext.get().bot_env.telegram_api_url)
+    dispatcher = updater.dispatcher
 
+    # register commands
+    bot_commands.list_notifications.register(dispatcher)
+    bot_commands.add_notification.register(dispatcher)
 
-# init db
-BotContext.get().database.create_tables()
-atexit.register(on_exit)
+    # observability
+    bot_env = BotContext.get().bot_env
+    if bot_env.tracing:
+        tracing.configure(True, bot_env.trace_profile, bot_env.trace_dir)
+    if bot_env.metrics_port:
+        metrics.serve(bot_env.metrics_port)
 
-updater = Updater(token=BotContext.get().bot_env.bot_token)
-dispatcher = updater.dispatcher
+    # register jobs
+    bot_jobs.check.register(dispatcher)
+    bot_jobs.delivery.register(dispatcher)
+    bot_jobs.history.register(dispatcher)
+    bot_jobs.realms.register(dispatcher)
 
-# register commands
-bot_commands.list_notifications.register(dispatcher)
-bot_commands.add_notification.register(dispatcher)
+    updater.start_polling()
+    updater.idle()
 
-# register jobs
-bot_jobs.check.register(dispatcher)
 
-updater.start_polling()
-updater.idle()
+# parse worker processes import this module, they must not start the bot
+if __name__ == '__main__':
+    main()